@@ -0,0 +1,106 @@
+# admission.py
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+# Ticket priorities that may use the reserved capacity
+RESERVED_PRIORITIES = ("High", "Critical")
+
+class AdmissionRejected(Exception):
+    """Raised when a ticket cannot be accepted right now"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many tickets in progress, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class AdmissionClosed(AdmissionRejected):
+    """Raised once the process stopped accepting tickets, e.g. at shutdown"""
+
+    def __init__(self, retry_after: int):
+        Exception.__init__(self, f"Not accepting tickets, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Bounds the tickets waiting in the shared queue, keeping places for urgent ones"""
+
+    # Retry-After before any processing time has been measured
+    DEFAULT_RETRY_AFTER = 30  # seconds
+
+    def __init__(self, max_in_flight: int = 4, max_queued: int = 50, reserved: int = 10,
+                 reserved_priorities: Tuple[str, ...] = RESERVED_PRIORITIES):
+        if reserved > max_queued:
+            raise ValueError("Reserved capacity exceeds the queue capacity")
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.reserved = reserved
+        self.reserved_priorities = tuple(p.lower() for p in reserved_priorities)
+        self._lock = threading.Lock()
+        self._durations: deque = deque(maxlen=50)
+        # Shared queue depth as of the last admission
+        self.queued = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.rejected_reserved = 0
+        self.closed = False
+
+    def admit(self, priority: Optional[str], queued: int):
+        """Take a place given the shared queue depth, or raise AdmissionRejected"""
+        reserved = str(priority or "").lower() in self.reserved_priorities
+        limit = self.max_queued if reserved else self.max_queued - self.reserved
+        with self._lock:
+            if self.closed:
+                raise AdmissionClosed(self.DEFAULT_RETRY_AFTER)
+            self.queued = queued
+            if queued >= limit:
+                self.rejected += 1
+                if reserved:
+                    self.rejected_reserved += 1
+                raise AdmissionRejected(self._retry_after())
+            self.queued += 1
+            self.admitted += 1
+
+    def withdraw(self):
+        """Give back the place of an admitted ticket that was not queued after all"""
+        with self._lock:
+            self.queued = max(0, self.queued - 1)
+            self.admitted -= 1
+
+    def close(self):
+        """Stop admitting tickets"""
+        with self._lock:
+            self.closed = True
+
+    def started(self):
+        """A worker of this process started processing a ticket"""
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, seconds: float):
+        """A ticket is done after the given processing time"""
+        with self._lock:
+            self.in_flight -= 1
+            self._durations.append(seconds)
+
+    def _retry_after(self) -> int:
+        """Seconds until the queue ahead has likely moved by one ticket per slot"""
+        if not self._durations:
+            return self.DEFAULT_RETRY_AFTER
+        average = sum(self._durations) / len(self._durations)
+        waves = (self.queued + self.max_in_flight) / self.max_in_flight
+        return max(1, math.ceil(average * waves))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "max_in_flight": self.max_in_flight,
+                "max_queued": self.max_queued,
+                "reserved": self.reserved,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "rejected_reserved": self.rejected_reserved,
+                "closed": self.closed
+            }
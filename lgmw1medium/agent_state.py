@@ -6,9 +6,15 @@ from ticket_receiver import ServiceNowTicket  # Add this import
 class AgentState(TypedDict):
     ticket: ServiceNowTicket
     classification: Dict[str, Any]
+    # Playbook and pre-flight results prepared while classifying, if kept
+    execution_plan: Dict[str, Any]
     execution_result: Dict[str, Any]
     validation_report: Dict[str, Any]
     update_response: Dict[str, Any]
     messages: List[str]
     current_agent: str
-    errors: List[str]
\ No newline at end of file
+    errors: List[str]
+    # Node to start from; set when resuming a ticket after a restart
+    resume_from: str
+    # Epoch seconds by which the ticket must finish, derived from its priority
+    deadline: float
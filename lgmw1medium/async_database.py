@@ -0,0 +1,35 @@
+# async_database.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from database import IncidentDB
+
+class AsyncIncidentDB:
+    """Awaitable IncidentDB whose methods run on a pool of database threads"""
+
+    def __init__(self, db: IncidentDB, max_workers: int = 4):
+        self.db = db
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="incident-db"
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking database callable on the database threads"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        return call
+
+    def close(self):
+        self._executor.shutdown(wait=True)
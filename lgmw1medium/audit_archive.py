@@ -0,0 +1,36 @@
+# audit_archive.py
+import gzip
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+class AuditArchive:
+    """Gzip-compressed NDJSON files holding audit rows rolled out of the live DB"""
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = Path(archive_dir)
+
+    def write(self, rows: List[Dict[str, Any]]) -> str:
+        """Write rows to a new archive file and return its name"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        name = f"audit_{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{rows[0]['id']}.ndjson.gz"
+        tmp_path = self.archive_dir / f"{name}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        # Only complete files ever appear under their final name
+        os.replace(tmp_path, self.archive_dir / name)
+        return name
+
+    def read(self, name: str, ticket_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yield the rows of an archive file, optionally for one ticket only"""
+        with gzip.open(self.archive_dir / name, "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if ticket_id is None or row["ticket_id"] == ticket_id:
+                    yield row
+
+    def delete(self, name: str):
+        (self.archive_dir / name).unlink(missing_ok=True)
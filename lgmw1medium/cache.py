@@ -0,0 +1,79 @@
+# cache.py
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+class IncidentCache:
+    """Bounded LRU cache with a TTL for incident rows"""
+
+    STRIPES = 256
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._generations = [0] * self.STRIPES
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _stripe(self, key: str) -> int:
+        return hash(key) % self.STRIPES
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (hit, value); the value is a copy callers may modify"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(entry[1])
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def token(self, key: str) -> int:
+        """Take before reading the database; pass to put()"""
+        with self._lock:
+            return self._generations[self._stripe(key)]
+
+    def put(self, key: str, value: Any, token: Optional[int] = None):
+        with self._lock:
+            # Invalidated since the read started, so a slow read cannot cache a stale row
+            if token is not None and token != self._generations[self._stripe(key)]:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._generations[self._stripe(key)] += 1
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generations = [generation + 1 for generation in self._generations]
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
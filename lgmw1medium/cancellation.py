@@ -0,0 +1,205 @@
+# cancellation.py
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Longest a single LLM request may wait for the server (httpx timeout)
+LLM_TIMEOUT = 300  # seconds
+
+class TicketCancelled(Exception):
+    """Raised inside the workflow once its ticket has been cancelled"""
+
+    def __init__(self, ticket_id: str):
+        super().__init__(f"Ticket {ticket_id} was cancelled")
+        self.ticket_id = ticket_id
+
+class DeadlineExceeded(TicketCancelled):
+    """Raised inside the workflow once its ticket ran past its deadline"""
+
+    def __init__(self, ticket_id: str, deadline: float):
+        Exception.__init__(
+            self, f"Ticket {ticket_id} missed its deadline of {datetime.fromtimestamp(deadline).isoformat()}"
+        )
+        self.ticket_id = ticket_id
+        self.deadline = deadline
+        # Workflow node that was running, filled in by the workflow
+        self.node: Optional[str] = None
+
+class TicketHandedOff(TicketCancelled):
+    """Raised inside the workflow once its ticket is handed back to the queue, e.g. at shutdown"""
+
+    def __init__(self, ticket_id: str):
+        Exception.__init__(self, f"Ticket {ticket_id} was handed back to the queue")
+        self.ticket_id = ticket_id
+
+class CancellationToken:
+    """Cancellation flag of one running ticket, also set once its deadline passes"""
+
+    def __init__(self, ticket_id: str, deadline: Optional[float] = None):
+        self.ticket_id = ticket_id
+        self.deadline = deadline
+        # Epoch seconds of the cancel request, once cancelled
+        self.requested_at: Optional[float] = None
+        # Stopped to be resumed by another worker rather than cancelled
+        self.handed_off = False
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, if there is one"""
+        return None if self.deadline is None else max(0.0, self.deadline - time.time())
+
+    def cancel(self, requested_at: Optional[float] = None):
+        if not self._event.is_set():
+            self.requested_at = requested_at or time.time()
+            self._event.set()
+
+    def hand_off(self):
+        if not self._event.is_set():
+            self.handed_off = True
+            self._event.set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TicketHandedOff(self.ticket_id) if self.handed_off else TicketCancelled(self.ticket_id)
+        if self.expired:
+            raise DeadlineExceeded(self.ticket_id, self.deadline)
+
+class CancellationRegistry:
+    """Cancellation tokens of the tickets this process runs, fed by cancelled events"""
+
+    def __init__(self):
+        self._tokens: Dict[str, CancellationToken] = {}
+        self._lock = threading.Lock()
+        self.requested = 0
+        self.stopped = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.handed_off = 0
+        # Tickets that missed their deadline, by the node they were in
+        self.deadlines_exceeded: Dict[str, int] = {}
+
+    def token(self, ticket_id: str) -> CancellationToken:
+        """The token of a ticket, registered on first call"""
+        with self._lock:
+            if ticket_id not in self._tokens:
+                self._tokens[ticket_id] = CancellationToken(ticket_id)
+            return self._tokens[ticket_id]
+
+    def release(self, ticket_id: str):
+        with self._lock:
+            self._tokens.pop(ticket_id, None)
+
+    def is_stopped(self, ticket_id: str) -> bool:
+        """Whether a running ticket was cancelled, handed off or ran out of time"""
+        with self._lock:
+            token = self._tokens.get(ticket_id)
+        return token is not None and (token.cancelled or token.expired)
+
+    def cancel(self, ticket_id: str, requested_at: Optional[float] = None) -> bool:
+        """Cancel a ticket if it runs here; returns whether it does"""
+        with self._lock:
+            token = self._tokens.get(ticket_id)
+            if token is None or token.cancelled:
+                return False
+            self.requested += 1
+        token.cancel(requested_at)
+        return True
+
+    def hand_off(self, ticket_id: str) -> bool:
+        """Stop a ticket at its next step, even its first, to be resumed elsewhere"""
+        token = self.token(ticket_id)
+        if token.cancelled:
+            return False
+        token.hand_off()
+        with self._lock:
+            self.handed_off += 1
+        return True
+
+    def on_event(self, event: Dict[str, Any]):
+        """Event bus listener that applies cancellations"""
+        if event["status"] == "cancelled":
+            self.cancel(event["ticket_id"], _epoch(event["timestamp"]))
+
+    def stopped_after(self, token: CancellationToken) -> float:
+        """Record that a cancelled ticket stopped; returns seconds since the request"""
+        latency = max(0.0, time.time() - (token.requested_at or time.time()))
+        with self._lock:
+            self.stopped += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+        return latency
+
+    def deadline_exceeded(self, node: str):
+        with self._lock:
+            self.deadlines_exceeded[node] = self.deadlines_exceeded.get(node, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": len(self._tokens),
+                "requested": self.requested,
+                "stopped": self.stopped,
+                "handed_off": self.handed_off,
+                "latency_seconds": {
+                    "avg": self.latency_total / self.stopped if self.stopped else 0.0,
+                    "max": self.latency_max
+                },
+                "deadline_exceeded": dict(self.deadlines_exceeded)
+            }
+
+
+def _epoch(timestamp: Optional[str]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def invoke_llm(llm, prompt: str, token: Optional[CancellationToken] = None) -> str:
+    """Call an LLM, streaming so a cancelled or expired ticket stops it between chunks"""
+    if token is None:
+        return llm.invoke(prompt)
+    token.raise_if_cancelled()
+    remaining = token.remaining()
+    if remaining is not None:
+        llm = with_timeout(llm, min(LLM_TIMEOUT, remaining))
+    chunks = []
+    try:
+        for chunk in llm.stream(prompt):
+            token.raise_if_cancelled()
+            chunks.append(chunk)
+    except TicketCancelled:
+        raise
+    except Exception as e:
+        # The request timed out at the deadline
+        if token.expired:
+            raise DeadlineExceeded(token.ticket_id, token.deadline) from e
+        raise
+    return "".join(chunks)
+
+
+def with_timeout(llm, seconds: float):
+    """Copy of an Ollama client with its own request timeout; other LLMs as they are"""
+    global _ssl_context
+    if not hasattr(llm, "sync_client_kwargs"):
+        return llm
+    if _ssl_context is None:
+        # Building one takes tens of milliseconds; copies share it
+        import httpx
+        _ssl_context = httpx.create_ssl_context()
+    options = llm.model_dump(exclude_unset=True)
+    options["client_kwargs"] = {"verify": _ssl_context, **(llm.client_kwargs or {})}
+    options["sync_client_kwargs"] = {**(llm.sync_client_kwargs or {}), "timeout": seconds}
+    return type(llm)(**options)
+
+
+_ssl_context = None
@@ -1,160 +1,1697 @@
 # database.py
 import sqlite3
-from datetime import datetime
-from typing import Dict, Any, List
+import base64
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
 import json
 from pathlib import Path
 import logging
+import queue
+import threading
+import zlib
+from audit_archive import AuditArchive
+from cache import IncidentCache
+
+# Schema migrations applied in order on top of the base tables. The number of
+# applied migrations is tracked in PRAGMA user_version, so only append here.
+MIGRATIONS = [
+    # 1: secondary indexes for audit history lookups and incident listing
+    [
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_ticket_timestamp ON audit_log(ticket_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_created_at ON incidents(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_status ON incidents(status)",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_environment ON incidents(environment)",
+    ],
+    # 2: filter indexes ending in created_at (plus the implicit rowid) so that
+    #    filtered listings are served in (created_at, id) order for keyset paging
+    [
+        "DROP INDEX IF EXISTS idx_incidents_status",
+        "DROP INDEX IF EXISTS idx_incidents_environment",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_status_created ON incidents(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_environment_created ON incidents(environment, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_priority_created ON incidents(priority, created_at)",
+    ],
+    # 3: manifest of audit rows rolled over into compressed archive files
+    [
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp ON audit_log(timestamp)",
+        """
+        CREATE TABLE IF NOT EXISTS audit_archives (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL UNIQUE,
+            created_at TEXT NOT NULL,
+            min_timestamp TEXT NOT NULL,
+            max_timestamp TEXT NOT NULL,
+            row_count INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_audit_archives_max_timestamp ON audit_archives(max_timestamp)",
+        """
+        CREATE TABLE IF NOT EXISTS audit_archive_tickets (
+            ticket_id TEXT NOT NULL,
+            archive_id INTEGER NOT NULL,
+            PRIMARY KEY (ticket_id, archive_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_audit_archive_tickets_archive ON audit_archive_tickets(archive_id)",
+    ],
+    # 4: generated columns over the JSON blobs so common fields can be
+    #    filtered through indexes without decoding the documents
+    [
+        """ALTER TABLE incidents ADD COLUMN middleware_type TEXT
+           GENERATED ALWAYS AS (json_extract(classification, '$.middleware_type')) VIRTUAL""",
+        """ALTER TABLE incidents ADD COLUMN risk_level TEXT
+           GENERATED ALWAYS AS (json_extract(classification, '$.risk_level')) VIRTUAL""",
+        """ALTER TABLE incidents ADD COLUMN playbook TEXT
+           GENERATED ALWAYS AS (json_extract(classification, '$.playbook_required')) VIRTUAL""",
+        """ALTER TABLE incidents ADD COLUMN overall_status TEXT
+           GENERATED ALWAYS AS (json_extract(validation_report, '$.overall_status')) VIRTUAL""",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_middleware_type_created ON incidents(middleware_type, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_risk_level_created ON incidents(risk_level, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_playbook_created ON incidents(playbook, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_incidents_overall_status_created ON incidents(overall_status, created_at)",
+    ],
+    # 5: incrementally maintained statistics. Triggers keep the current count
+    #    per (status, environment, priority, middleware_type, playbook) and
+    #    per-minute counts of status transitions in the writing transaction
+    [
+        """
+        CREATE TABLE IF NOT EXISTS incident_counters (
+            status TEXT NOT NULL,
+            environment TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            middleware_type TEXT NOT NULL,
+            playbook TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (status, environment, priority, middleware_type, playbook)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS incident_rollups (
+            minute TEXT NOT NULL,
+            status TEXT NOT NULL,
+            environment TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            middleware_type TEXT NOT NULL,
+            playbook TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (minute, status, environment, priority, middleware_type, playbook)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS incidents_stats_insert AFTER INSERT ON incidents
+        BEGIN
+            INSERT INTO incident_counters VALUES (NEW.status, NEW.environment, NEW.priority, coalesce(NEW.middleware_type, ''), coalesce(NEW.playbook, ''), 1)
+            ON CONFLICT DO UPDATE SET count = count + 1;
+            INSERT INTO incident_rollups VALUES (substr(NEW.updated_at, 1, 16), NEW.status, NEW.environment, NEW.priority, coalesce(NEW.middleware_type, ''), coalesce(NEW.playbook, ''), 1)
+            ON CONFLICT DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS incidents_stats_update
+        AFTER UPDATE OF status, environment, priority, classification ON incidents
+        WHEN (OLD.status, OLD.environment, OLD.priority,
+              coalesce(OLD.middleware_type, ''), coalesce(OLD.playbook, ''))
+          IS NOT (NEW.status, NEW.environment, NEW.priority, coalesce(NEW.middleware_type, ''), coalesce(NEW.playbook, ''))
+        BEGIN
+            UPDATE incident_counters SET count = count - 1
+            WHERE status = OLD.status AND environment = OLD.environment AND priority = OLD.priority
+                AND middleware_type = coalesce(OLD.middleware_type, '') AND playbook = coalesce(OLD.playbook, '');
+            DELETE FROM incident_counters
+            WHERE status = OLD.status AND environment = OLD.environment AND priority = OLD.priority
+                AND middleware_type = coalesce(OLD.middleware_type, '') AND playbook = coalesce(OLD.playbook, '') AND count <= 0;
+            INSERT INTO incident_counters VALUES (NEW.status, NEW.environment, NEW.priority, coalesce(NEW.middleware_type, ''), coalesce(NEW.playbook, ''), 1)
+            ON CONFLICT DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS incidents_stats_transition
+        AFTER UPDATE OF status ON incidents
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            INSERT INTO incident_rollups VALUES (substr(NEW.updated_at, 1, 16), NEW.status, NEW.environment, NEW.priority, coalesce(NEW.middleware_type, ''), coalesce(NEW.playbook, ''), 1)
+            ON CONFLICT DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS incidents_stats_delete AFTER DELETE ON incidents
+        BEGIN
+            UPDATE incident_counters SET count = count - 1
+            WHERE status = OLD.status AND environment = OLD.environment AND priority = OLD.priority
+                AND middleware_type = coalesce(OLD.middleware_type, '') AND playbook = coalesce(OLD.playbook, '');
+            DELETE FROM incident_counters
+            WHERE status = OLD.status AND environment = OLD.environment AND priority = OLD.priority
+                AND middleware_type = coalesce(OLD.middleware_type, '') AND playbook = coalesce(OLD.playbook, '') AND count <= 0;
+        END
+        """,
+        # Backfill from existing rows; past transitions are only known by
+        # the minute each incident reached its current status
+        """
+        INSERT INTO incident_counters
+        SELECT status, environment, priority, coalesce(middleware_type, ''),
+               coalesce(playbook, ''), count(*)
+        FROM incidents GROUP BY 1, 2, 3, 4, 5
+        """,
+        """
+        INSERT INTO incident_rollups
+        SELECT substr(updated_at, 1, 16), status, environment, priority,
+               coalesce(middleware_type, ''), coalesce(playbook, ''), count(*)
+        FROM incidents GROUP BY 1, 2, 3, 4, 5, 6
+        """,
+    ],
+    # 6: full-text search over ticket text and workflow output; description
+    #    and ci_name are now stored so they can be searched
+    [
+        "ALTER TABLE incidents ADD COLUMN description TEXT",
+        "ALTER TABLE incidents ADD COLUMN ci_name TEXT",
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS incidents_fts USING fts5(
+            description, ci_name, messages, error,
+            content='incidents', content_rowid='id'
+        )
+        """,
+        # Matches on the host name weigh most, workflow output least
+        "INSERT INTO incidents_fts(incidents_fts, rank) VALUES ('rank', 'bm25(1.0, 2.0, 0.5, 0.5)')",
+        """
+        CREATE TRIGGER IF NOT EXISTS incidents_fts_insert AFTER INSERT ON incidents
+        BEGIN
+            INSERT INTO incidents_fts(rowid, description, ci_name, messages, error)
+            VALUES (NEW.id, NEW.description, NEW.ci_name, NEW.messages, NEW.error);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS incidents_fts_update
+        AFTER UPDATE OF description, ci_name, messages, error ON incidents
+        BEGIN
+            INSERT INTO incidents_fts(incidents_fts, rowid, description, ci_name, messages, error)
+            VALUES ('delete', OLD.id, OLD.description, OLD.ci_name, OLD.messages, OLD.error);
+            INSERT INTO incidents_fts(rowid, description, ci_name, messages, error)
+            VALUES (NEW.id, NEW.description, NEW.ci_name, NEW.messages, NEW.error);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS incidents_fts_delete AFTER DELETE ON incidents
+        BEGIN
+            INSERT INTO incidents_fts(incidents_fts, rowid, description, ci_name, messages, error)
+            VALUES ('delete', OLD.id, OLD.description, OLD.ci_name, OLD.messages, OLD.error);
+        END
+        """,
+        "INSERT INTO incidents_fts(incidents_fts) VALUES ('rebuild')",
+    ],
+    # 7: large JSON members (raw playbook logs) are stored compressed aside
+    [
+        """
+        CREATE TABLE IF NOT EXISTS incident_payloads (
+            ticket_id TEXT NOT NULL,
+            field TEXT NOT NULL,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (ticket_id, field)
+        ) WITHOUT ROWID
+        """,
+    ],
+    # 8: Idempotency-Key responses of /process-ticket, purged after a while
+    [
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            ticket_id TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at)",
+    ],
+    # 9: the submitted ticket is kept so unfinished work can be resumed after
+    #    a restart; resumable marks tickets handed off by a graceful shutdown
+    [
+        "ALTER TABLE incidents ADD COLUMN ticket_data TEXT",
+        "ALTER TABLE incidents ADD COLUMN resumable INTEGER NOT NULL DEFAULT 0",
+    ],
+    # 10: state shared by API worker processes: the queue of admitted tickets
+    #    claimed by workers, worker heartbeats, status events relayed between
+    #    processes, and the worker that processed each incident
+    [
+        """
+        CREATE TABLE IF NOT EXISTS ticket_queue (
+            ticket_id TEXT PRIMARY KEY,
+            priority TEXT,
+            environment TEXT NOT NULL,
+            enqueued_at TEXT NOT NULL,
+            resume INTEGER NOT NULL DEFAULT 0,
+            worker_id TEXT,
+            claimed_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ticket_queue_worker ON ticket_queue(worker_id)",
+        """
+        CREATE TABLE IF NOT EXISTS workers (
+            worker_id TEXT PRIMARY KEY,
+            started_at TEXT NOT NULL,
+            heartbeat_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ticket_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            agent TEXT,
+            message TEXT,
+            timestamp TEXT NOT NULL,
+            worker_id TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ticket_events_timestamp ON ticket_events(timestamp)",
+        "ALTER TABLE incidents ADD COLUMN worker_id TEXT",
+    ],
+    # 11: leases on target hosts (or host groups), so a host runs one
+    #     playbook at a time across all API processes
+    [
+        """
+        CREATE TABLE IF NOT EXISTS host_leases (
+            key TEXT PRIMARY KEY,
+            ticket_id TEXT NOT NULL,
+            worker_id TEXT NOT NULL,
+            acquired_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL
+        )
+        """,
+    ],
+]
+
+# Unit of work flush granularity: "node" commits after every workflow node,
+# "ticket" is a relaxed mode that commits once when the ticket finishes
+COMMIT_MODES = ("node", "ticket")
+
+# Statuses of tickets the workflow has not finished yet
+IN_PROGRESS_STATUSES = ("received", "classified", "executed", "validated")
+
+# Status of cancelled tickets; final, later workflow writes leave the row as is
+CANCELLED_STATUS = "cancelled"
+
+# Columns the incident listings can be filtered on
+FILTER_COLUMNS = (
+    "status", "environment", "priority",
+    "middleware_type", "risk_level", "overall_status", "playbook",
+)
+
+# Dimensions of the incremental statistics, as maintained by migration 5
+STATS_DIMENSIONS = ("status", "environment", "priority", "middleware_type", "playbook")
+
+# Tables that stay small regardless of incident volume and may be scanned
+BOUNDED_TABLES = ("incident_counters", "ticket_queue", "workers", "host_leases")
+
+# Columns stored as JSON text and decoded when read
+JSON_FIELDS = ("classification", "execution_result", "validation_report", "messages")
+
+# Columns whose large top-level members are moved to incident_payloads,
+# compressed, leaving {"$payload": "<column>.<member>", "size": n} in the row
+PAYLOAD_FIELDS = ("execution_result", "validation_report")
+PAYLOAD_THRESHOLD = 4096
+
+# Ticket ids per existence lookup in import_incidents, under SQLite's
+# bound-parameter limit
+IMPORT_LOOKUP_CHUNK = 500
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque cursor"""
+    raw = json.dumps([created_at, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+class InvalidCursorError(ValueError):
+    """Raised for pagination cursors that were not issued by this database"""
+
+class IdempotencyKeyError(ValueError):
+    """Raised when an idempotency key is reused for a different ticket"""
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        if not isinstance(created_at, str) or not isinstance(row_id, int):
+            raise ValueError
+        return created_at, row_id
+    except Exception:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
 
 class IncidentDB:
-    def __init__(self, db_path: str = "incidents.db"):
+    def __init__(self, db_path: str = "incidents.db", explain: bool = False,
+                 commit_mode: str = "node", group_commit: bool = True,
+                 archive_dir: Optional[str] = None,
+                 cache: Optional[IncidentCache] = None):
+        if commit_mode not in COMMIT_MODES:
+            raise ValueError(f"Invalid commit mode: {commit_mode}")
         self.db_path = db_path
         self.logger = logging.getLogger(__name__ + ".IncidentDB")
-        self._init_db()
-        
+        # When enabled, every statement is preceded by EXPLAIN QUERY PLAN
+        self.explain = explain
+        self.query_plans: List[Dict[str, Any]] = []
+        # Default flush granularity for units of work (see COMMIT_MODES)
+        self.commit_mode = commit_mode
+        self.group_committer = GroupCommitter(self) if group_commit else None
+        # Old audit rows are rolled over into compressed files next to the DB
+        self.audit_archive = AuditArchive(
+            archive_dir or str(Path(db_path).parent / "audit_archive")
+        )
+        # Optional read-through cache for get_incident, invalidated on writes
+        self.cache = cache
+        # The schema is created and migrated on first use, not at construction
+        self._schema_lock = threading.Lock()
+        self._columns: Optional[List[str]] = None
+        self._readable_columns: Set[str] = set()
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection that commits on success and is always closed"""
+        self._ensure_schema()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _execute(self, cursor: sqlite3.Cursor, query: str, params=()):
+        """Execute a statement, recording its query plan in explain mode"""
+        if self.explain:
+            self._explain(cursor.connection, query, params)
+        return cursor.execute(query, params)
+
+    def _explain(self, conn: sqlite3.Connection, query: str, params=()):
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+        # A bare "SCAN <table>" (no index) or a temp b-tree sort is a regression,
+        # except on tables bounded by design and on subquery results, which
+        # are already narrowed down by the subquery's own plan
+        derived = {step.split()[1] for step in plan
+                   if step.startswith(("MATERIALIZE ", "CO-ROUTINE "))}
+        def scans_table(step: str) -> bool:
+            if not step.startswith("SCAN ") or " USING " in step:
+                return False
+            # Full-text MATCH is answered by the FTS index
+            if " VIRTUAL TABLE INDEX " in step and ":M" in step:
+                return False
+            name = step.split()[1]
+            return not (name in BOUNDED_TABLES or name in derived or name.startswith("("))
+        full_scan = any(
+            scans_table(step) or "USE TEMP B-TREE" in step
+            for step in plan
+        )
+        entry = {"query": " ".join(query.split()), "plan": plan, "full_scan": full_scan}
+        self.query_plans.append(entry)
+        print(f"EXPLAIN QUERY PLAN {entry['query']}")
+        for step in plan:
+            print(f"    {step}")
+        if full_scan:
+            self.logger.warning(f"Query without index: {entry['query']}")
+
+    def _ensure_schema(self):
+        if self._columns is None:
+            with self._schema_lock:
+                if self._columns is None:
+                    self._init_db()
+
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            # Create incidents table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS incidents (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ticket_id TEXT NOT NULL UNIQUE,
-                    priority TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    classification TEXT NOT NULL,
-                    execution_result TEXT NOT NULL,
-                    validation_report TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL,
-                    messages TEXT NOT NULL,
-                    environment TEXT NOT NULL DEFAULT 'production',
-                    error TEXT
-                )
-            """)
-            # Create audit log table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS audit_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ticket_id TEXT NOT NULL,
-                    action TEXT NOT NULL,
-                    agent TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    details TEXT NOT NULL
-                )
-            """)
-            conn.commit()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                # WAL needs one fsync per commit and lets readers run during writes
+                conn.execute("PRAGMA journal_mode=WAL")
+                cursor = conn.cursor()
+                # Create incidents table
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS incidents (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        ticket_id TEXT NOT NULL UNIQUE,
+                        priority TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        classification TEXT NOT NULL,
+                        execution_result TEXT NOT NULL,
+                        validation_report TEXT NOT NULL,
+                        created_at TEXT NOT NULL,
+                        updated_at TEXT NOT NULL,
+                        messages TEXT NOT NULL,
+                        environment TEXT NOT NULL DEFAULT 'production',
+                        error TEXT
+                    )
+                """)
+                # Create audit log table
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS audit_log (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        ticket_id TEXT NOT NULL,
+                        action TEXT NOT NULL,
+                        agent TEXT NOT NULL,
+                        timestamp TEXT NOT NULL,
+                        details TEXT NOT NULL
+                    )
+                """)
+                self._migrate(conn)
+                # Schema only changes through migrations, so columns can be cached.
+                # table_info omits generated columns, which cannot be written
+                readable_columns = {col[1] for col in conn.execute("PRAGMA table_xinfo(incidents)")}
+                columns = [col[1] for col in conn.execute("PRAGMA table_info(incidents)")]
+        finally:
+            conn.close()
+        self._readable_columns = readable_columns
+        # Set last: other threads take a set _columns as the schema being ready
+        self._columns = columns
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Apply schema migrations not yet recorded in user_version"""
+        # Hold the write lock while reading the version, so API processes
+        # starting together apply each migration once
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+            self.logger.info(f"Applied database migration {number}")
+
+    def check_writable(self):
+        """Raise unless the database can take its write lock"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.rollback()
 
     def create_incident(self, ticket_data: Dict[str, Any]) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            timestamp = datetime.now().isoformat()
-            cursor.execute("""
-                INSERT INTO incidents (
-                    ticket_id, priority, status, classification,
-                    execution_result, validation_report, created_at,
-                    updated_at, messages, environment
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                ticket_data["ticket_id"],
-                ticket_data.get("priority", "medium"),
-                "received",
-                "{}", 
-                "{}", 
-                "{}",
-                timestamp, 
-                timestamp, 
-                "[]",
-                ticket_data.get("environment", "production")  # Added this missing value
-            ))
-            conn.commit()
-            return cursor.lastrowid
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._insert_incident(cursor, ticket_data, datetime.now().isoformat())
+        self._invalidate(ticket_data["ticket_id"])
+        return cursor.lastrowid
 
     def update_incident(self, ticket_id: str, updates: Dict[str, Any]):
         """Update incident with proper parameter binding"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # First check if column exists
-                cursor.execute("PRAGMA table_info(incidents)")
-                columns = [col[1] for col in cursor.fetchall()]
-                
-                # Only include updates for columns that exist
-                valid_updates = {k: v for k, v in updates.items() if k in columns}
-                
-                if not valid_updates:
-                    return
-                    
-                set_clause = ", ".join(f"{k} = ?" for k in valid_updates.keys())
-                values = list(valid_updates.values())
-                
-                # Add updated_at and ticket_id to values
-                values.append(datetime.now().isoformat())
-                values.append(ticket_id)
-                
-                query = f"""
-                    UPDATE incidents 
-                    SET {set_clause}, updated_at = ?
-                    WHERE ticket_id = ?
-                """
-                cursor.execute(query, values)
-                conn.commit()
+            with self._connect() as conn:
+                self._apply_update(conn.cursor(), ticket_id, updates, datetime.now().isoformat())
         except Exception as e:
             self.logger.error(f"Error updating incident: {str(e)}")
             raise
+        finally:
+            self._invalidate(ticket_id)
 
     def log_audit(self, ticket_id: str, action: str, agent: str, details: str):
         """Log audit entry with proper parameter binding"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO audit_log (
-                    ticket_id, action, agent, timestamp, details
-                ) VALUES (?, ?, ?, ?, ?)
-            """, (
-                ticket_id, action, agent, 
-                datetime.now().isoformat(), details
-            ))
-
-    def get_all_incidents(self, limit: int = 100, skip: int = 0) -> list[dict]:
-        """Get all incidents from database with pagination"""
+        with self._connect() as conn:
+            self._insert_audit(conn.cursor(), ticket_id, action, agent, details,
+                               datetime.now().isoformat())
+
+    def _invalidate(self, ticket_id: str):
+        if self.cache:
+            self.cache.invalidate(ticket_id)
+
+    def admit_incident(self, ticket_data: Dict[str, Any], idempotency_key: Optional[str] = None,
+                       response: Optional[Dict[str, Any]] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Create and queue an incident unless it exists; returns (created, replayed response)"""
+        ticket_id = ticket_data["ticket_id"]
+        timestamp = datetime.now().isoformat()
+        with self._connect() as conn:
+            # Take the write lock first so the key lookup cannot go stale
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            previous = self._stored_response(cursor, ticket_id, idempotency_key)
+            if previous is not None:
+                return False, previous
+            created = self._insert_incident(cursor, ticket_data, timestamp)
+            if created:
+                self._enqueue(cursor, ticket_data, False, timestamp)
+            if created and idempotency_key:
+                self._execute(cursor, """
+                    INSERT INTO idempotency_keys (key, ticket_id, response, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, (idempotency_key, ticket_id, json.dumps(response or {}), timestamp))
+        if created:
+            self._invalidate(ticket_id)
+        return created, None
+
+    def find_submission(self, ticket_id: str,
+                        idempotency_key: Optional[str] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Look up a submission without writing; returns (exists, previous) like admit_incident"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            previous = self._stored_response(cursor, ticket_id, idempotency_key)
+            if previous is not None:
+                return True, previous
+            self._execute(cursor, "SELECT 1 FROM incidents WHERE ticket_id = ?", (ticket_id,))
+            return cursor.fetchone() is not None, None
+
+    def _stored_response(self, cursor: sqlite3.Cursor, ticket_id: str,
+                         idempotency_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The response stored with an idempotency key, if it was seen before"""
+        if not idempotency_key:
+            return None
+        self._execute(cursor, """
+            SELECT ticket_id, response FROM idempotency_keys WHERE key = ?
+        """, (idempotency_key,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        if row[0] != ticket_id:
+            raise IdempotencyKeyError(
+                f"Idempotency key {idempotency_key} was used for ticket {row[0]}"
+            )
+        return json.loads(row[1])
+
+    def purge_idempotency_keys(self, older_than: timedelta) -> int:
+        """Forget idempotency keys older than the given age"""
+        cutoff = (datetime.now() - older_than).isoformat()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, "DELETE FROM idempotency_keys WHERE created_at < ?", (cutoff,))
+            return cursor.rowcount
+
+    def _insert_incident(self, cursor: sqlite3.Cursor, ticket_data: Dict[str, Any], timestamp: str) -> bool:
+        """Insert a new incident; an existing one is left as is. Returns whether it was inserted"""
+        self._execute(cursor, """
+            INSERT INTO incidents (
+                ticket_id, priority, status, classification,
+                execution_result, validation_report, created_at,
+                updated_at, messages, environment, description, ci_name,
+                ticket_data
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(ticket_id) DO NOTHING
+        """, (
+            ticket_data["ticket_id"],
+            ticket_data.get("priority", "medium"),
+            "received",
+            "{}", 
+            "{}", 
+            "{}",
+            timestamp, 
+            timestamp, 
+            "[]",
+            ticket_data.get("environment", "production"),  # Added this missing value
+            ticket_data.get("description"),
+            ticket_data.get("ci_name"),
+            json.dumps(ticket_data)
+        ))
+        return cursor.rowcount == 1
+
+    def get_unfinished_incidents(self) -> List[Dict[str, Any]]:
+        """Tickets the workflow has not finished, oldest first"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            self._execute(cursor, f"""
+                SELECT ticket_id, status, priority, resumable, ticket_data, created_at,
+                       EXISTS(SELECT 1 FROM ticket_queue q WHERE q.ticket_id = incidents.ticket_id) AS queued
+                FROM incidents
+                WHERE status IN ({", ".join("?" for _ in IN_PROGRESS_STATUSES)})
+            """, IN_PROGRESS_STATUSES)
+            rows = [dict(row) for row in cursor.fetchall()]
+        for row in rows:
+            row["ticket_data"] = json.loads(row["ticket_data"]) if row["ticket_data"] else None
+            row["queued"] = bool(row["queued"])
+        return sorted(rows, key=lambda row: row["created_at"])
+
+    def cancel_incident(self, ticket_id: str, agent: str = "api") -> Tuple[bool, Optional[str]]:
+        """Cancel an unfinished ticket; returns (cancelled, status before)"""
+        timestamp = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            self._execute(cursor, "SELECT status FROM incidents WHERE ticket_id = ?", (ticket_id,))
+            row = cursor.fetchone()
+            if row is None or row[0] not in IN_PROGRESS_STATUSES:
+                return False, row[0] if row else None
+            self._execute(cursor, """
+                UPDATE incidents SET status = ?, updated_at = ? WHERE ticket_id = ?
+            """, (CANCELLED_STATUS, timestamp, ticket_id))
+            self._execute(cursor, """
+                DELETE FROM ticket_queue WHERE ticket_id = ? AND worker_id IS NULL
+            """, (ticket_id,))
+            self._insert_audit(cursor, ticket_id, "ticket_cancelled", agent,
+                               json.dumps({"status": row[0]}), timestamp)
+        self._invalidate(ticket_id)
+        return True, row[0]
+
+    # Ticket queue shared by the API worker processes
+
+    def _enqueue(self, cursor: sqlite3.Cursor, ticket_data: Dict[str, Any],
+                 resume: bool, timestamp: str) -> bool:
+        self._execute(cursor, """
+            INSERT INTO ticket_queue (ticket_id, priority, environment, enqueued_at, resume)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(ticket_id) DO NOTHING
+        """, (
+            ticket_data["ticket_id"],
+            ticket_data.get("priority"),
+            str(ticket_data.get("environment") or "production"),
+            timestamp,
+            int(resume)
+        ))
+        return cursor.rowcount == 1
+
+    def enqueue_ticket(self, ticket_data: Dict[str, Any], resume: bool = False) -> bool:
+        """Queue an existing incident for the workers unless it is queued already"""
+        with self._connect() as conn:
+            return self._enqueue(conn.cursor(), ticket_data, resume, datetime.now().isoformat())
+
+    def queued_tickets(self) -> List[Dict[str, Any]]:
+        """Tickets waiting for a worker, with their target host, in no particular order"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT q.ticket_id, q.priority, q.environment, q.enqueued_at, i.ci_name
+                FROM ticket_queue q LEFT JOIN incidents i ON i.ticket_id = q.ticket_id
+                WHERE q.worker_id IS NULL
+            """)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def queue_depth(self) -> int:
+        """Number of tickets waiting for a worker in any process"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, "SELECT count(*) FROM ticket_queue WHERE worker_id IS NULL")
+            return cursor.fetchone()[0]
+
+    def claim_ticket(self, ticket_id: str, worker_id: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """Take a queued ticket for a worker; (ticket_data, resume), or None if taken"""
+        timestamp = datetime.now().isoformat()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                UPDATE ticket_queue SET worker_id = ?, claimed_at = ?
+                WHERE ticket_id = ? AND worker_id IS NULL
+                RETURNING resume
+            """, (worker_id, timestamp, ticket_id))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            resume = bool(row[0])
+            self._execute(cursor, """
+                UPDATE incidents SET worker_id = ? WHERE ticket_id = ? RETURNING ticket_data
+            """, (worker_id, ticket_id))
+            incident = cursor.fetchone()
+            if incident is None or not incident[0]:
+                # Nothing to run; drop the entry instead of handing it out again
+                self._execute(cursor, "DELETE FROM ticket_queue WHERE ticket_id = ?", (ticket_id,))
+                return None
+        self._invalidate(ticket_id)
+        return json.loads(incident[0]), resume
+
+    def complete_ticket(self, ticket_id: str, worker_id: str) -> bool:
+        """Remove a processed ticket from the queue, if the worker still holds it"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                DELETE FROM ticket_queue WHERE ticket_id = ? AND worker_id = ?
+            """, (ticket_id, worker_id))
+            return cursor.rowcount == 1
+
+    def hand_off_ticket(self, ticket_id: str, worker_id: str, agent: str = "shutdown") -> bool:
+        """Requeue a ticket the worker stopped, flagged resumable, if it still holds the claim"""
+        timestamp = datetime.now().isoformat()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                UPDATE ticket_queue SET worker_id = NULL, claimed_at = NULL, resume = 1
+                WHERE ticket_id = ? AND worker_id = ?
+            """, (ticket_id, worker_id))
+            if not cursor.rowcount:
+                return False
+            self._execute(cursor, f"""
+                UPDATE incidents SET resumable = 1, updated_at = ?
+                WHERE ticket_id = ? AND status IN ({", ".join("?" for _ in IN_PROGRESS_STATUSES)})
+            """, (timestamp, ticket_id, *IN_PROGRESS_STATUSES))
+            if cursor.rowcount:
+                self._insert_audit(cursor, ticket_id, "ticket_handed_off", agent,
+                                   "Unfinished at shutdown, resumable", timestamp)
+        self._invalidate(ticket_id)
+        return True
+
+    def release_orphaned_tickets(self, live_workers: List[str]) -> List[str]:
+        """Requeue tickets claimed by workers not in live_workers; returns their ids"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, f"""
+                UPDATE ticket_queue SET worker_id = NULL, claimed_at = NULL, resume = 1
+                WHERE worker_id IS NOT NULL
+                    AND worker_id NOT IN ({", ".join("?" for _ in live_workers)})
+                RETURNING ticket_id
+            """, tuple(live_workers))
+            orphaned = [row[0] for row in cursor.fetchall()]
+            # Their host leases go with them
+            self._execute(cursor, f"""
+                DELETE FROM host_leases
+                WHERE worker_id NOT IN ({", ".join("?" for _ in live_workers)})
+            """, tuple(live_workers))
+            return orphaned
+
+    def heartbeat(self, worker_id: str) -> bool:
+        """Record that a worker is alive; False if it was not registered (new or timed out)"""
+        timestamp = datetime.now().isoformat()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                UPDATE workers SET heartbeat_at = ? WHERE worker_id = ?
+            """, (timestamp, worker_id))
+            if cursor.rowcount:
+                return True
+            self._execute(cursor, """
+                INSERT INTO workers (worker_id, started_at, heartbeat_at) VALUES (?, ?, ?)
+            """, (worker_id, timestamp, timestamp))
+            return False
+
+    def live_workers(self, timeout: timedelta) -> List[str]:
+        """Workers with a heartbeat within timeout; older entries are removed"""
+        cutoff = (datetime.now() - timeout).isoformat()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, "DELETE FROM workers WHERE heartbeat_at < ?", (cutoff,))
+            self._execute(cursor, "SELECT worker_id FROM workers")
+            return [row[0] for row in cursor.fetchall()]
+
+    def remove_worker(self, worker_id: str):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, "DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+            self._execute(cursor, "DELETE FROM host_leases WHERE worker_id = ?", (worker_id,))
+
+    # Host leases, serializing playbook runs per host across processes
+
+    def acquire_host_lease(self, key: str, ticket_id: str, worker_id: str, ttl: timedelta) -> bool:
+        """Take, take over or extend a host lease; returns whether the ticket holds it"""
+        now = datetime.now()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                INSERT INTO host_leases (key, ticket_id, worker_id, acquired_at, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    ticket_id = excluded.ticket_id,
+                    worker_id = excluded.worker_id,
+                    acquired_at = excluded.acquired_at,
+                    expires_at = excluded.expires_at
+                WHERE (host_leases.ticket_id = excluded.ticket_id
+                       AND host_leases.worker_id = excluded.worker_id)
+                    OR host_leases.expires_at < excluded.acquired_at
+            """, (key, ticket_id, worker_id, now.isoformat(), (now + ttl).isoformat()))
+            return cursor.rowcount == 1
+
+    def release_host_lease(self, key: str, ticket_id: str, worker_id: str):
+        with self._connect() as conn:
+            self._execute(conn.cursor(), """
+                DELETE FROM host_leases WHERE key = ? AND ticket_id = ? AND worker_id = ?
+            """, (key, ticket_id, worker_id))
+
+    def held_host_keys(self) -> List[str]:
+        """Host keys with a lease that has not expired"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, "SELECT key FROM host_leases WHERE expires_at >= ?",
+                          (datetime.now().isoformat(),))
+            return [row[0] for row in cursor.fetchall()]
+
+    def renew_host_leases(self, worker_id: str, ticket_ids: List[str], ttl: timedelta) -> int:
+        """Extend a worker's leases for the tickets it still runs; others expire"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, f"""
+                UPDATE host_leases SET expires_at = ?
+                WHERE worker_id = ? AND ticket_id IN ({", ".join("?" for _ in ticket_ids)})
+            """, ((datetime.now() + ttl).isoformat(), worker_id, *ticket_ids))
+            return cursor.rowcount
+
+    # Status events relayed between the API worker processes
+
+    def record_ticket_event(self, event: Dict[str, Any], worker_id: str) -> int:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                INSERT INTO ticket_events (ticket_id, status, agent, message, timestamp, worker_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (event["ticket_id"], event["status"], event.get("agent"),
+                  event.get("message"), event["timestamp"], worker_id))
+            return cursor.lastrowid
+
+    def ticket_events_after(self, after: int, limit: int = 500) -> List[Dict[str, Any]]:
+        """Events recorded after the given event id, oldest first"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT id, ticket_id, status, agent, message, timestamp, worker_id
+                FROM ticket_events WHERE id > ? ORDER BY id LIMIT ?
+            """, (after, limit))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def last_ticket_event_id(self) -> int:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, "SELECT max(id) FROM ticket_events")
+            return cursor.fetchone()[0] or 0
+
+    def purge_ticket_events(self, older_than: timedelta) -> int:
+        cutoff = (datetime.now() - older_than).isoformat()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, "DELETE FROM ticket_events WHERE timestamp < ?", (cutoff,))
+            return cursor.rowcount
+
+    def _apply_update(self, cursor: sqlite3.Cursor, ticket_id: str,
+                      updates: Dict[str, Any], timestamp: str):
+        # Only include updates for columns that exist
+        valid_updates = {k: v for k, v in updates.items() if k in self._columns}
+        if not valid_updates:
+            return
+        for column in PAYLOAD_FIELDS:
+            if column in valid_updates:
+                valid_updates[column], payloads = split_payloads(column, valid_updates[column])
+                self._store_payloads(cursor, ticket_id, column, payloads)
+
+        set_clause = ", ".join(f"{k} = ?" for k in valid_updates.keys())
+        values = list(valid_updates.values())
+        values.append(timestamp)
+        values.append(ticket_id)
+        values.append(CANCELLED_STATUS)
+        self._execute(cursor, f"""
+            UPDATE incidents 
+            SET {set_clause}, updated_at = ?
+            WHERE ticket_id = ? AND status != ?
+        """, values)
+
+    def _store_payloads(self, cursor: sqlite3.Cursor, ticket_id: str, column: str,
+                        payloads: List[Tuple[str, bytes, int]]):
+        """Write a column's compressed members, dropping ones it no longer has"""
+        # The primary key range holding "<column>.*"
+        self._execute(cursor, """
+            DELETE FROM incident_payloads WHERE ticket_id = ? AND field > ? AND field < ?
+        """, (ticket_id, f"{column}.", f"{column}/"))
+        for field, data, size in payloads:
+            self._execute(cursor, """
+                INSERT INTO incident_payloads (ticket_id, field, data, size) VALUES (?, ?, ?, ?)
+                ON CONFLICT DO UPDATE SET data = excluded.data, size = excluded.size
+            """, (ticket_id, field, data, size))
+
+    def _load_payloads(self, cursor: sqlite3.Cursor,
+                       ticket_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Decompress the payloads of the given tickets, by ticket and field"""
+        loaded: Dict[str, Dict[str, Any]] = {}
+        if not ticket_ids:
+            return loaded
+        self._execute(cursor, f"""
+            SELECT ticket_id, field, data FROM incident_payloads
+            WHERE ticket_id IN ({", ".join("?" for _ in ticket_ids)})
+        """, ticket_ids)
+        for ticket_id, field, data in cursor.fetchall():
+            loaded.setdefault(ticket_id, {})[field] = json.loads(zlib.decompress(data))
+        return loaded
+
+    def get_payload(self, ticket_id: str, field: str) -> Any:
+        """Load one offloaded member, e.g. ``execution_result.logs``"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT data FROM incident_payloads WHERE ticket_id = ? AND field = ?
+            """, (ticket_id, field))
+            row = cursor.fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def _insert_audit(self, cursor: sqlite3.Cursor, ticket_id: str, action: str,
+                      agent: str, details: str, timestamp: str):
+        self._execute(cursor, """
+            INSERT INTO audit_log (
+                ticket_id, action, agent, timestamp, details
+            ) VALUES (?, ?, ?, ?, ?)
+        """, (ticket_id, action, agent, timestamp, details))
+
+    def unit_of_work(self, ticket_id: str, mode: Optional[str] = None) -> "IncidentUnitOfWork":
+        """Start buffering writes for one ticket"""
+        return IncidentUnitOfWork(self, ticket_id, mode or self.commit_mode)
+
+    def commit_writes(self, writes: List[Tuple]):
+        """Commit buffered writes, grouped with other tickets when enabled"""
+        if self.group_committer:
+            self.group_committer.submit(writes)
+        else:
+            self._commit_writes(writes)
+
+    def group_commit_stats(self) -> Optional[Dict[str, int]]:
+        if not self.group_committer:
+            return None
+        return {
+            "commits": self.group_committer.commits,
+            "flushes": self.group_committer.flushes
+        }
+
+    def _commit_writes(self, writes: List[Tuple]):
+        """Apply buffered writes in a single transaction"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            for kind, *args in writes:
+                if kind == "create":
+                    self._insert_incident(cursor, *args)
+                elif kind == "update":
+                    self._apply_update(cursor, *args)
+                elif kind == "audit":
+                    self._insert_audit(cursor, *args)
+                else:
+                    raise ValueError(f"Unknown write: {kind}")
+        for kind, *args in writes:
+            if kind == "create":
+                self._invalidate(args[0]["ticket_id"])
+            elif kind == "update":
+                self._invalidate(args[0])
+
+    def _filter_clause(self, filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        """Build WHERE conditions for the supported listing filters"""
+        conditions, params = [], []
+        for column in FILTER_COLUMNS:
+            if filters.get(column) is not None:
+                conditions.append(f"{column} = ?")
+                params.append(filters[column])
+        return conditions, params
+
+    def get_all_incidents(self, limit: int = 100, skip: int = 0, **filters) -> list[dict]:
+        """Get all incidents from database with offset pagination"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            conditions, params = self._filter_clause(filters)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            with self._connect() as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
-                cursor.execute("""
+                self._execute(cursor, f"""
                     SELECT 
                         ticket_id, priority, status, 
                         created_at, updated_at, environment
                     FROM incidents 
-                    ORDER BY created_at DESC
+                    {where}
+                    ORDER BY created_at DESC, id DESC
                     LIMIT ? OFFSET ?
-                """, (limit, skip))
+                """, (*params, limit, skip))
                 
                 return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
             self.logger.error(f"Database error in get_all_incidents: {str(e)}")
             raise ValueError("Error retrieving incidents from database") 
+
+    def get_incidents_page(self, limit: int = 100, cursor: Optional[str] = None,
+                           **filters) -> Tuple[list[dict], Optional[str]]:
+        """One page of incidents on a (created_at, id) keyset, with the next cursor or None"""
+        # Fetch one extra row to know whether another page exists
+        rows = self._select_page(limit + 1, cursor, **filters)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        for row in rows:
+            del row["id"]
+        return rows, next_cursor
     
-    def get_incident(self, ticket_id: str) -> Dict[str, Any]:
+    def iter_incidents(self, batch_size: int = 1000, **filters) -> Iterator[Dict[str, Any]]:
+        """Stream full incident rows from a server-side cursor in constant memory"""
+        conditions, params = self._filter_clause(filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        self._ensure_schema()
+        columns = [column for column in self._columns if column != "id"]
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.cursor()
+            self._execute(cursor, f"""
+                SELECT {", ".join(columns)} FROM incidents {where} ORDER BY created_at, id
+            """, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                incidents = [dict(row) for row in rows]
+                offloaded = [
+                    incident["ticket_id"] for incident in incidents
+                    if any('"$payload"' in incident[column] for column in PAYLOAD_FIELDS)
+                ]
+                payloads = self._load_payloads(conn.cursor(), offloaded)
+                for incident in incidents:
+                    for json_field in JSON_FIELDS:
+                        incident[json_field] = json.loads(incident[json_field])
+                    inflate_payloads(incident, payloads.get(incident["ticket_id"], {}))
+                    yield incident
+        finally:
+            conn.close()
+
+    def import_incidents(self, incidents: Iterable[Dict[str, Any]],
+                         batch_size: int = 5000, replace: bool = False) -> int:
+        """Bulk load exported incidents, one transaction per batch; returns the rows written"""
+        self._ensure_schema()
+        columns = [column for column in self._columns if column != "id"]
+        # An upsert rather than INSERT OR REPLACE, whose implicit deletes
+        # would bypass the statistics triggers
+        if replace:
+            conflict = "DO UPDATE SET " + ", ".join(
+                f"{column} = excluded.{column}" for column in columns if column != "ticket_id"
+            )
+        else:
+            conflict = "DO NOTHING"
+        query = f"""
+            INSERT INTO incidents ({", ".join(columns)})
+            VALUES ({", ".join("?" for _ in columns)})
+            ON CONFLICT(ticket_id) {conflict}
+        """
+        written = 0
+        batch = []
+        for incident in incidents:
+            values = self._import_values(incident, columns)
+            payloads = []
+            for column in PAYLOAD_FIELDS:
+                index = columns.index(column)
+                values[index], split = split_payloads(column, values[index])
+                payloads.append((column, split))
+            batch.append((incident["ticket_id"], tuple(values), payloads))
+            if len(batch) >= batch_size:
+                written += self._import_batch(query, batch, replace)
+                batch = []
+        if batch:
+            written += self._import_batch(query, batch, replace)
+        if self.cache:
+            self.cache.clear()
+        return written
+
+    def _import_values(self, incident: Dict[str, Any], columns: List[str]) -> List[Any]:
+        timestamp = datetime.now().isoformat()
+        defaults = {
+            "priority": "medium",
+            "status": "received",
+            "classification": "{}",
+            "execution_result": "{}",
+            "validation_report": "{}",
+            "messages": "[]",
+            "created_at": timestamp,
+            "updated_at": incident.get("created_at", timestamp),
+            "environment": "production",
+            "resumable": 0,
+        }
+        values = []
+        for column in columns:
+            value = incident.get(column, defaults.get(column))
+            if column in JSON_FIELDS and not isinstance(value, str):
+                value = json.dumps(value)
+            values.append(value)
+        return values
+
+    def _import_batch(self, query: str,
+                      batch: List[Tuple[str, Tuple, List[Tuple[str, List[Tuple[str, bytes, int]]]]]],
+                      replace: bool) -> int:
+        # Payloads are only written for the row that lands in incidents: the
+        # last one for a ticket when replacing, else the first one, and none
+        # for tickets that already exist
+        rows = {}
+        for ticket_id, values, payloads in batch:
+            if replace or ticket_id not in rows:
+                rows[ticket_id] = (values, payloads)
+        with self._connect() as conn:
+            # The write lock keeps the existing tickets from changing between
+            # the lookup and the insert
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            if not replace:
+                ticket_ids = list(rows)
+                for start in range(0, len(ticket_ids), IMPORT_LOOKUP_CHUNK):
+                    chunk = ticket_ids[start:start + IMPORT_LOOKUP_CHUNK]
+                    self._execute(cursor, f"""
+                        SELECT ticket_id FROM incidents
+                        WHERE ticket_id IN ({", ".join("?" for _ in chunk)})
+                    """, chunk)
+                    for (ticket_id,) in cursor.fetchall():
+                        del rows[ticket_id]
+            self._executemany(conn, cursor, query, [values for ticket_id, values, _ in batch])
+            written = cursor.rowcount
+            if replace:
+                self._executemany(conn, cursor, """
+                    DELETE FROM incident_payloads WHERE ticket_id = ? AND field > ? AND field < ?
+                """, [(ticket_id, f"{column}.", f"{column}/")
+                      for ticket_id, (_, payloads) in rows.items() for column, _ in payloads])
+            conflict = "DO UPDATE SET data = excluded.data, size = excluded.size" if replace else "DO NOTHING"
+            self._executemany(conn, cursor, f"""
+                INSERT INTO incident_payloads (ticket_id, field, data, size) VALUES (?, ?, ?, ?)
+                ON CONFLICT {conflict}
+            """, [(ticket_id, *row) for ticket_id, (_, payloads) in rows.items()
+                  for _, split in payloads for row in split])
+            return written
+
+    def _executemany(self, conn: sqlite3.Connection, cursor: sqlite3.Cursor,
+                     query: str, rows: List[Tuple]):
+        if not rows:
+            return
+        if self.explain:
+            self._explain(conn, query, rows[0])
+        cursor.executemany(query, rows)
+
+    def _select_page(self, limit: int, cursor: Optional[str] = None, **filters) -> list[dict]:
+        """Rows after the keyset cursor in (created_at, id) descending order, with id"""
+        conditions, params = self._filter_clause(filters)
+        if cursor:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            with self._connect() as conn:
+                conn.row_factory = sqlite3.Row
+                db_cursor = conn.cursor()
+                self._execute(db_cursor, f"""
+                    SELECT 
+                        id, ticket_id, priority, status, 
+                        created_at, updated_at, environment
+                    FROM incidents 
+                    {where}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                """, (*params, limit))
+                return [dict(row) for row in db_cursor.fetchall()]
+        except Exception as e:
+            self.logger.error(f"Database error in get_incidents_page: {str(e)}")
+            raise ValueError("Error retrieving incidents from database")
+
+    def get_incident(self, ticket_id: str, fields: Optional[List[str]] = None,
+                     include_payloads: bool = False) -> Dict[str, Any]:
+        """Get an incident, decoding only the selected columns"""
+        incident = self._get_incident(ticket_id, fields)
+        if include_payloads and incident and has_payloads(incident):
+            with self._connect() as conn:
+                payloads = self._load_payloads(conn.cursor(), [ticket_id])
+            inflate_payloads(incident, payloads.get(ticket_id, {}))
+        return incident
+
+    def _get_incident(self, ticket_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        if fields is not None:
+            self._ensure_schema()
+            unknown = set(fields) - self._readable_columns
+            if unknown:
+                raise ValueError(f"Unknown incident fields: {', '.join(sorted(unknown))}")
+        if self.cache is None:
+            return self._read_incident(ticket_id, fields)
+
+        # The cache holds whole rows and serves any projection from them
+        hit, incident = self.cache.get(ticket_id)
+        if not hit:
+            token = self.cache.token(ticket_id)
+            incident = self._read_incident(ticket_id)
+            if incident is None:
+                return None
+            self.cache.put(ticket_id, incident, token)
+        return {field: incident[field] for field in fields} if fields else incident
+
+    def _read_incident(self, ticket_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        columns = ", ".join(fields) if fields else "*"
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM incidents WHERE ticket_id = ?
+                self._execute(cursor, f"""
+                    SELECT {columns} FROM incidents WHERE ticket_id = ?
                 """, (ticket_id,))
                 row = cursor.fetchone()
                 if not row:
                     return None
                 # Convert SQLite Row to dict and decode JSON fields
                 result = dict(row)
-                for json_field in ['classification', 'execution_result', 
-                                'validation_report', 'messages']:
+                for json_field in JSON_FIELDS:
                     if result.get(json_field):
                         result[json_field] = json.loads(result[json_field])
                 return result
         except Exception as e:
             print(f"Database error: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    def get_incident_history(self, ticket_id: str, after: Optional[str] = None,
+                             limit: int = 100) -> Optional[Dict[str, Any]]:
+        """An incident and a page of its audit trail with node durations, in one query"""
+        # Buffered writes can commit after direct ones, so ids do not follow
+        # timestamps and the page position needs both
+        after_key = decode_cursor(after) if after else ("", 0)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            # Pages are read straight off the (ticket_id, timestamp) index; the
+            # first row of every page still looks up its predecessor
+            self._execute(cursor, """
+                SELECT 
+                    i.ticket_id, i.priority, i.status, i.environment,
+                    i.created_at, i.updated_at, i.error,
+                    EXISTS (
+                        SELECT 1 FROM audit_archive_tickets a
+                        WHERE a.ticket_id = i.ticket_id
+                    ) AS has_archive,
+                    t.id AS audit_id, t.action, t.agent, t.timestamp,
+                    t.details, t.previous_timestamp
+                FROM incidents i
+                LEFT JOIN (
+                    SELECT id, action, agent, timestamp, details, (
+                        SELECT p.timestamp FROM audit_log p
+                        WHERE p.ticket_id = l.ticket_id AND (p.timestamp, p.id) < (l.timestamp, l.id)
+                        ORDER BY p.timestamp DESC, p.id DESC LIMIT 1
+                    ) AS previous_timestamp
+                    FROM audit_log l
+                    WHERE l.ticket_id = ? AND (l.timestamp, l.id) > (?, ?)
+                    ORDER BY l.timestamp, l.id LIMIT ?
+                ) t
+                WHERE i.ticket_id = ?
+            """, (ticket_id, *after_key, limit + 1, ticket_id))
+            rows = [dict(row) for row in cursor.fetchall()]
+        if not rows:
+            return None
+
+        incident_columns = ("ticket_id", "priority", "status", "environment",
+                            "created_at", "updated_at", "error")
+        incident = {column: rows[0][column] for column in incident_columns}
+        trail = [
+            {
+                "id": row["audit_id"], "ticket_id": ticket_id, "action": row["action"],
+                "agent": row["agent"], "timestamp": row["timestamp"],
+                "details": row["details"], "previous_timestamp": row["previous_timestamp"]
+            }
+            for row in rows if row["audit_id"] is not None
+        ]
+        trail.sort(key=lambda row: (row["timestamp"], row["id"]))
+
+        if rows[0]["has_archive"]:
+            # Rows are archived by id, so live rows can sort before archived
+            # ones; each row's predecessor may come from either side
+            archived = self._archived_audit_rows(ticket_id)
+            keys = [(row["timestamp"], row["id"], row) for row in archived]
+            if archived:
+                keys += [(timestamp, row_id, None) for timestamp, row_id in
+                         self._live_audit_keys(ticket_id, archived[-1]["timestamp"])]
+            previous = None
+            for timestamp, _, row in sorted(keys, key=lambda key: key[:2]):
+                if row is not None:
+                    row["previous_timestamp"] = previous
+                previous = timestamp
+            trail_ids = {id(row) for row in trail}
+            merged = sorted(archived + trail, key=lambda row: (row["timestamp"], row["id"]))
+            last_archived = None
+            for row in merged:
+                if id(row) not in trail_ids:
+                    last_archived = row["timestamp"]
+                elif last_archived and (row["previous_timestamp"] or "") < last_archived:
+                    row["previous_timestamp"] = last_archived
+            trail = [row for row in merged if (row["timestamp"], row["id"]) > after_key]
+
+        page = trail[:limit]
+        node_durations: Dict[str, float] = {}
+        for row in page:
+            started = datetime.fromisoformat(row.pop("previous_timestamp") or incident["created_at"])
+            row["duration_seconds"] = (datetime.fromisoformat(row["timestamp"]) - started).total_seconds()
+            node_durations[row["agent"]] = node_durations.get(row["agent"], 0.0) + row["duration_seconds"]
+        return {
+            "incident": incident,
+            "audit_log": page,
+            "node_durations": node_durations,
+            "next_after": encode_cursor(page[-1]["timestamp"], page[-1]["id"]) if len(trail) > limit else None
+        }
+
+    def search_incidents(self, query: str, limit: int = 20,
+                         offset: int = 0) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Full-text search, best first; returns the results and the next offset or None"""
+        match = fts_query(query)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT 
+                    i.ticket_id, i.priority, i.status, i.environment,
+                    i.ci_name, i.description, i.created_at, i.updated_at,
+                    snippet(incidents_fts, -1, '[', ']', '...', 12) AS snippet,
+                    incidents_fts.rank AS rank
+                FROM incidents_fts
+                JOIN incidents i ON i.id = incidents_fts.rowid
+                WHERE incidents_fts MATCH ?
+                ORDER BY incidents_fts.rank
+                LIMIT ? OFFSET ?
+            """, (match, limit + 1, offset))
+            results = [dict(row) for row in cursor.fetchall()]
+        next_offset = offset + limit if len(results) > limit else None
+        return results[:limit], next_offset
+
+    def get_stats(self, since: Optional[str] = None, per_minute: bool = False) -> Dict[str, Any]:
+        """Incident counts and transitions since a time (default today) from maintained tables"""
+        since = since or datetime.now().strftime("%Y-%m-%dT00:00")
+        counters, rollups = self._stats_rows(since)
+        return summarize_stats(counters, rollups, since, per_minute)
+
+    def _stats_rows(self, since: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            self._execute(cursor, "SELECT * FROM incident_counters")
+            counters = [dict(row) for row in cursor.fetchall()]
+            self._execute(cursor, "SELECT * FROM incident_rollups WHERE minute >= ?", (since,))
+            rollups = [dict(row) for row in cursor.fetchall()]
+        return counters, rollups
+
+    def get_audit_log(self, ticket_id: str) -> List[Dict[str, Any]]:
+        """Get a ticket's audit rows oldest first, including archived ones"""
+        archived = self._archived_audit_rows(ticket_id)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT id, ticket_id, action, agent, timestamp, details
+                FROM audit_log WHERE ticket_id = ?
+                ORDER BY timestamp, id
+            """, (ticket_id,))
+            live_rows = [dict(row) for row in cursor.fetchall()]
+        return archived + live_rows
+
+    def _archived_audit_rows(self, ticket_id: str) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT a.path FROM audit_archive_tickets t
+                JOIN audit_archives a ON a.id = t.archive_id
+                WHERE t.ticket_id = ?
+                ORDER BY t.archive_id
+            """, (ticket_id,))
+            archives = [row[0] for row in cursor.fetchall()]
+        rows = []
+        for path in archives:
+            rows.extend(self.audit_archive.read(path, ticket_id))
+        rows.sort(key=lambda row: (row["timestamp"], row["id"]))
+        return rows
+
+    def _live_audit_keys(self, ticket_id: str, until: str) -> List[Tuple[str, int]]:
+        """(timestamp, id) of live audit rows no newer than ``until``"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, """
+                SELECT timestamp, id FROM audit_log WHERE ticket_id = ? AND timestamp <= ?
+            """, (ticket_id, until))
+            return cursor.fetchall()
+
+    def rollover_audit_log(self, older_than: Optional[timedelta] = None,
+                           max_live_rows: Optional[int] = None,
+                           batch_size: int = 10000) -> int:
+        """Move old audit rows into compressed archive files; returns the rows moved"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cutoff_id = 0
+            if older_than is not None:
+                cutoff = (datetime.now() - older_than).isoformat()
+                self._execute(cursor, """
+                    SELECT id FROM audit_log WHERE timestamp < ?
+                    ORDER BY timestamp DESC LIMIT 1
+                """, (cutoff,))
+                row = cursor.fetchone()
+                cutoff_id = max(cutoff_id, row[0] if row else 0)
+            if max_live_rows is not None:
+                # Rows only leave the live table oldest first, so the id range
+                # gives the live row count without a table scan
+                self._execute(cursor, "SELECT max(id) FROM audit_log")
+                max_id = cursor.fetchone()[0] or 0
+                cutoff_id = max(cutoff_id, max_id - max_live_rows)
+
+        archived = 0
+        while cutoff_id:
+            moved = self._archive_audit_batch(cutoff_id, batch_size)
+            if not moved:
+                break
+            archived += moved
+        if archived:
+            self.logger.info(f"Archived {archived} audit rows")
+        return archived
+
+    def _archive_audit_batch(self, cutoff_id: int, batch_size: int) -> int:
+        while True:
+            with self._connect() as conn:
+                conn.row_factory = sqlite3.Row
+                cursor = conn.cursor()
+                self._execute(cursor, """
+                    SELECT id, ticket_id, action, agent, timestamp, details
+                    FROM audit_log WHERE id <= ?
+                    ORDER BY id LIMIT ?
+                """, (cutoff_id, batch_size))
+                rows = [dict(row) for row in cursor.fetchall()]
+            if not rows:
+                return 0
+            moved = self._archive_audit_rows(rows)
+            if moved:
+                return moved
+            # Another process archived some of these rows first; read again
+
+    def _archive_audit_rows(self, rows: List[Dict[str, Any]]) -> int:
+        """Archive rows read from audit_log; 0 if some already left it"""
+        # The file is complete before the rows leave the live table; if the
+        # transaction fails the rows stay live and the file is dropped
+        path = self.audit_archive.write(rows)
+        try:
+            with self._connect() as conn:
+                # Under the write lock, check no other process (every API
+                # worker runs the rollover) archived the rows meanwhile. Ids
+                # only grow, so a full count means all rows are still live
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.cursor()
+                self._execute(cursor, "SELECT count(*) FROM audit_log WHERE id BETWEEN ? AND ?",
+                              (rows[0]["id"], rows[-1]["id"]))
+                if cursor.fetchone()[0] != len(rows):
+                    conn.rollback()
+                    self.audit_archive.delete(path)
+                    return 0
+                timestamps = [row["timestamp"] for row in rows]
+                self._execute(cursor, """
+                    INSERT INTO audit_archives (
+                        path, created_at, min_timestamp, max_timestamp, row_count
+                    ) VALUES (?, ?, ?, ?, ?)
+                """, (path, datetime.now().isoformat(), min(timestamps),
+                      max(timestamps), len(rows)))
+                archive_id = cursor.lastrowid
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO audit_archive_tickets (ticket_id, archive_id)
+                    VALUES (?, ?)
+                """, [(ticket_id, archive_id) for ticket_id in {row["ticket_id"] for row in rows}])
+                self._execute(cursor, "DELETE FROM audit_log WHERE id BETWEEN ? AND ?",
+                              (rows[0]["id"], rows[-1]["id"]))
+        except Exception:
+            self.audit_archive.delete(path)
+            raise
+        return len(rows)
+
+    def purge_stats_rollups(self, older_than: timedelta) -> int:
+        """Delete per-minute transition rollups older than the given age"""
+        cutoff = (datetime.now() - older_than).isoformat()[:16]
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, "DELETE FROM incident_rollups WHERE minute < ?", (cutoff,))
+            return cursor.rowcount
+
+    def purge_audit_archives(self, older_than: timedelta) -> int:
+        """Delete archive files whose newest row is older than the retention"""
+        cutoff = (datetime.now() - older_than).isoformat()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            self._execute(cursor, "SELECT id, path FROM audit_archives WHERE max_timestamp < ?", (cutoff,))
+            expired = cursor.fetchall()
+            for archive_id, _ in expired:
+                self._execute(cursor, "DELETE FROM audit_archive_tickets WHERE archive_id = ?", (archive_id,))
+                self._execute(cursor, "DELETE FROM audit_archives WHERE id = ?", (archive_id,))
+        for _, path in expired:
+            self.audit_archive.delete(path)
+        return len(expired)
+
+
+def split_payloads(column: str, value: Any) -> Tuple[Any, List[Tuple[str, bytes, int]]]:
+    """Replace a JSON object's large members by placeholders; returns it and their rows"""
+    if not isinstance(value, str) or len(value) <= PAYLOAD_THRESHOLD:
+        return value, []
+    try:
+        document = json.loads(value)
+    except ValueError:
+        return value, []
+    if not isinstance(document, dict):
+        return value, []
+    payloads = []
+    for member, member_value in document.items():
+        encoded = json.dumps(member_value)
+        if len(encoded) > PAYLOAD_THRESHOLD:
+            field = f"{column}.{member}"
+            payloads.append((field, zlib.compress(encoded.encode()), len(encoded)))
+            document[member] = {"$payload": field, "size": len(encoded)}
+    return (json.dumps(document) if payloads else value), payloads
+
+
+def has_payloads(incident: Dict[str, Any]) -> bool:
+    """Whether a decoded incident holds any payload placeholders"""
+    return any(
+        isinstance(member_value, dict) and "$payload" in member_value
+        for column in PAYLOAD_FIELDS if isinstance(incident.get(column), dict)
+        for member_value in incident[column].values()
+    )
+
+
+def inflate_payloads(incident: Dict[str, Any], payloads: Dict[str, Any]):
+    """Replace placeholders in a decoded incident with their loaded values"""
+    for column in PAYLOAD_FIELDS:
+        document = incident.get(column)
+        if not isinstance(document, dict):
+            continue
+        for member, member_value in document.items():
+            if isinstance(member_value, dict) and member_value.get("$payload") in payloads:
+                document[member] = payloads[member_value["$payload"]]
+
+
+def fts_query(text: str) -> str:
+    """Quote every term into an FTS5 query matching all; a trailing * searches a prefix"""
+    terms = []
+    for term in text.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*-")
+        if not term:
+            continue
+        quoted = '"' + term.replace('"', '""') + '"'
+        terms.append(f"{quoted} *" if prefix else quoted)
+    if not terms:
+        raise ValueError("Search query is empty")
+    return " AND ".join(terms)
+
+
+def summarize_stats(counters: List[Dict[str, Any]], rollups: List[Dict[str, Any]],
+                    since: str, per_minute: bool = False) -> Dict[str, Any]:
+    """Aggregate raw counter and rollup rows (possibly from several shards)"""
+    def aggregate(rows):
+        breakdown: Dict[Tuple, int] = {}
+        for row in rows:
+            key = tuple(row[dimension] or None for dimension in STATS_DIMENSIONS)
+            breakdown[key] = breakdown.get(key, 0) + row["count"]
+        summary = {"total": sum(breakdown.values())}
+        for index, dimension in enumerate(STATS_DIMENSIONS):
+            totals: Dict[Any, int] = {}
+            for key, count in breakdown.items():
+                totals[key[index]] = totals.get(key[index], 0) + count
+            summary[f"by_{dimension}"] = totals
+        summary["breakdown"] = [
+            {**dict(zip(STATS_DIMENSIONS, key)), "count": count}
+            for key, count in breakdown.items() if count
+        ]
+        return summary
+
+    stats = {
+        "current": aggregate(counters),
+        "since": since,
+        "transitions": aggregate(rollups),
+    }
+    if per_minute:
+        minutes: Dict[Tuple[str, str], int] = {}
+        for row in rollups:
+            key = (row["minute"], row["status"])
+            minutes[key] = minutes.get(key, 0) + row["count"]
+        stats["per_minute"] = [
+            {"minute": minute, "status": status, "count": count}
+            for (minute, status), count in sorted(minutes.items())
+        ]
+    return stats
+
+
+class IncidentUnitOfWork:
+    """Buffers one ticket's incident updates and audit rows until flushed"""
+
+    def __init__(self, db: IncidentDB, ticket_id: str, mode: str = "node"):
+        if mode not in COMMIT_MODES:
+            raise ValueError(f"Invalid commit mode: {mode}")
+        self.db = db
+        self.ticket_id = ticket_id
+        self.mode = mode
+        self.writes: List[Tuple] = []
+
+    def create_incident(self, ticket_data: Dict[str, Any]):
+        self.writes.append(("create", ticket_data, datetime.now().isoformat()))
+
+    def update_incident(self, updates: Dict[str, Any]):
+        timestamp = datetime.now().isoformat()
+        # Fold consecutive updates into one UPDATE statement
+        if self.writes and self.writes[-1][0] == "update":
+            _, ticket_id, pending, _ = self.writes[-1]
+            self.writes[-1] = ("update", ticket_id, {**pending, **updates}, timestamp)
+        else:
+            self.writes.append(("update", self.ticket_id, dict(updates), timestamp))
+
+    def log_audit(self, action: str, agent: str, details: str):
+        self.writes.append(("audit", self.ticket_id, action, agent, details,
+                            datetime.now().isoformat()))
+
+    def end_node(self):
+        """Called after each workflow node; flushes unless in relaxed mode"""
+        if self.mode == "node":
+            self.flush()
+
+    def flush(self):
+        """Commit all buffered writes in one transaction"""
+        if not self.writes:
+            return
+        writes, self.writes = self.writes, []
+        try:
+            self.db.commit_writes(writes)
+        except Exception:
+            # Keep the writes so a later flush can retry them
+            self.writes = writes + self.writes
+            raise
+
+
+class _CommitRequest:
+    def __init__(self, writes: List[Tuple]):
+        self.writes = writes
+        self.done = threading.Event()
+        self.error: Optional[Exception] = None
+
+
+class GroupCommitter:
+    """Writer thread committing concurrently flushed batches in one transaction"""
+
+    def __init__(self, db: IncidentDB, max_batch: int = 64):
+        self.db = db
+        self.max_batch = max_batch
+        self.commits = 0
+        self.flushes = 0
+        self._queue: "queue.Queue[_CommitRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, writes: List[Tuple]):
+        request = _CommitRequest(writes)
+        self._ensure_started()
+        self._queue.put(request)
+        request.done.wait()
+        if request.error:
+            raise request.error
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="incident-db-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch: List[_CommitRequest]):
+        try:
+            self.db._commit_writes([write for request in batch for write in request.writes])
+            self.commits += 1
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+            else:
+                # Isolate the failing ticket instead of failing the whole group
+                for request in batch:
+                    try:
+                        self.db._commit_writes(request.writes)
+                        self.commits += 1
+                    except Exception as request_error:
+                        request.error = request_error
+        finally:
+            self.flushes += len(batch)
+            for request in batch:
+                request.done.set()
@@ -0,0 +1,182 @@
+# events.py
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Statuses after which a ticket produces no further events
+TERMINAL_STATUSES = ("success", "failed", "cancelled", "deadline_exceeded")
+
+class TicketEventBus:
+    """In-process pub/sub of ticket status transitions onto asyncio queues"""
+
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        # Called synchronously with every event, e.g. to apply cancellations
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, ticket_id: str) -> asyncio.Queue:
+        """Start receiving a ticket's events; call from the event loop"""
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.setdefault(ticket_id, []).append(subscription)
+        return subscription[1]
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Call listener with every event, on the publishing thread"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, ticket_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscriptions = [s for s in self._subscribers.get(ticket_id, []) if s[1] is not queue]
+            if subscriptions:
+                self._subscribers[ticket_id] = subscriptions
+            else:
+                self._subscribers.pop(ticket_id, None)
+
+    def publish(self, ticket_id: str, status: str, agent: Optional[str] = None,
+                message: Optional[str] = None, timestamp: Optional[str] = None) -> Dict[str, Any]:
+        """Publish a status transition; safe to call from any thread"""
+        event = {
+            "ticket_id": ticket_id,
+            "status": status,
+            "agent": agent,
+            "message": message,
+            "timestamp": timestamp or datetime.now().isoformat()
+        }
+        with self._lock:
+            subscriptions = list(self._subscribers.get(ticket_id, []))
+            listeners = list(self._listeners)
+            self.published += 1
+        for listener in listeners:
+            listener(event)
+        for loop, queue in subscriptions:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                pass  # The subscriber's loop has closed
+        return event
+
+    def _deliver(self, queue: asyncio.Queue, event: Dict[str, Any]):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client misses intermediate events, never the loop
+            self.dropped += 1
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": self.subscriber_count(),
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+
+class EventRelay:
+    """Shares ticket events between API processes through the database"""
+
+    BATCH_SIZE = 500
+
+    def __init__(self, bus: TicketEventBus, db, worker_id: str, interval: float = 0.25):
+        self.bus = bus
+        self.db = db
+        self.worker_id = worker_id
+        self.interval = interval
+        self.logger = logging.getLogger(__name__ + ".EventRelay")
+        self._last_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.relayed = 0
+
+    def publish(self, ticket_id: str, status: str, agent: Optional[str] = None,
+                message: Optional[str] = None):
+        """Publish here and to the other processes; safe to call from any thread"""
+        event = self.bus.publish(ticket_id, status, agent, message)
+        try:
+            self.db.record_ticket_event(event, self.worker_id)
+        except Exception as e:
+            self.logger.error(f"Could not share event of ticket {ticket_id}: {str(e)}")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                if self._last_id is None:
+                    # Only events from now on; clients read the current state first
+                    self._last_id = self.db.last_ticket_event_id()
+                self._relay()
+            except Exception as e:
+                self.logger.error(f"Relaying ticket events failed: {str(e)}")
+            if self._stop.wait(self.interval):
+                return
+
+    def _relay(self):
+        while True:
+            events = self.db.ticket_events_after(self._last_id, self.BATCH_SIZE)
+            for event in events:
+                self._last_id = event["id"]
+                if event["worker_id"] != self.worker_id:
+                    # The incident changed in another process
+                    if self.db.cache:
+                        self.db.cache.invalidate(event["ticket_id"])
+                    self.bus.publish(event["ticket_id"], event["status"], event["agent"],
+                                     event["message"], timestamp=event["timestamp"])
+                    self.relayed += 1
+            if len(events) < self.BATCH_SIZE:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {"last_event_id": self._last_id, "relayed": self.relayed}
+
+
+async def ticket_events(bus: TicketEventBus, ticket_id: str, current: Optional[Dict[str, Any]],
+                        queue: asyncio.Queue, heartbeat: float) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """Yield a ticket's events until it finishes, and None when idle for heartbeat seconds"""
+    last_status, last_timestamp = None, ""
+    try:
+        if current:
+            last_status, last_timestamp = current["status"], current["updated_at"]
+            yield {
+                "ticket_id": ticket_id,
+                "status": current["status"],
+                "agent": None,
+                "message": None,
+                "timestamp": current["updated_at"]
+            }
+            if last_status in TERMINAL_STATUSES:
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            # Events published before the initial read are already reflected
+            if event["status"] == last_status or event["timestamp"] < last_timestamp:
+                continue
+            last_status, last_timestamp = event["status"], event["timestamp"]
+            yield event
+            if last_status in TERMINAL_STATUSES:
+                return
+    finally:
+        bus.unsubscribe(ticket_id, queue)
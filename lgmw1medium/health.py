@@ -0,0 +1,107 @@
+# health.py
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Ollama server of the classifier and validator (OLLAMA_HOST, as the client reads it)
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+# Models the workflow's LLM agents use
+REQUIRED_MODELS = ("llama3", "mistral")
+
+class ReadinessProbes:
+    """Dependency checks run in the background, so readiness probes only read results"""
+
+    def __init__(self, db, interval: float = 10.0, max_queue_depth: int = 50,
+                 ollama_url: str = OLLAMA_URL, models: Tuple[str, ...] = REQUIRED_MODELS,
+                 timeout: float = 2.0):
+        self.db = db
+        self.interval = interval
+        self.max_queue_depth = max_queue_depth
+        self.ollama_url = ollama_url if "://" in ollama_url else f"http://{ollama_url}"
+        self.models = models
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__ + ".ReadinessProbes")
+        self.checks: Dict[str, Callable[[], str]] = {
+            "database": self.check_database,
+            "ollama": self.check_ollama,
+            "queue": self.check_queue,
+        }
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="readiness-probes", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            self.run_checks()
+            if self._stop.wait(self.interval):
+                return
+
+    def run_checks(self) -> Dict[str, Dict[str, Any]]:
+        """Run every check now and cache the results"""
+        results = {}
+        for name, check in self.checks.items():
+            started = time.monotonic()
+            try:
+                results[name] = {"ok": True, "detail": check()}
+            except Exception as e:
+                results[name] = {"ok": False, "detail": str(e)}
+            results[name]["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+            results[name]["checked_at"] = datetime.now().isoformat()
+        failed = [name for name, result in results.items() if not result["ok"]]
+        if failed:
+            self.logger.warning(f"Readiness checks failed: {', '.join(failed)}")
+        with self._lock:
+            self._results = results
+            self._checked_at = time.monotonic()
+        return results
+
+    def check_database(self) -> str:
+        self.db.check_writable()
+        return "writable"
+
+    def check_ollama(self) -> str:
+        with urllib.request.urlopen(f"{self.ollama_url}/api/tags", timeout=self.timeout) as response:
+            tags = json.load(response)
+        available = {model["name"] for model in tags.get("models", [])}
+        # Models are listed with their tag, e.g. llama3:latest
+        missing = [
+            model for model in self.models
+            if model not in available and not any(name.startswith(f"{model}:") for name in available)
+        ]
+        if missing:
+            raise RuntimeError(f"Models not loaded: {', '.join(missing)}")
+        return f"{len(available)} models available"
+
+    def check_queue(self) -> str:
+        depth = self.db.queue_depth()
+        if depth >= self.max_queue_depth:
+            raise RuntimeError(f"{depth} tickets queued (limit {self.max_queue_depth})")
+        return f"{depth} tickets queued"
+
+    def status(self) -> Tuple[bool, Dict[str, Dict[str, Any]]]:
+        """(ready, results of the last checks) without running any check"""
+        with self._lock:
+            results, checked_at = dict(self._results), self._checked_at
+        if checked_at is None:
+            return False, {"probes": {"ok": False, "detail": "Not checked yet"}}
+        if time.monotonic() - checked_at > 3 * self.interval:
+            return False, {**results, "probes": {"ok": False, "detail": "Results are stale"}}
+        return all(result["ok"] for result in results.values()), results
@@ -0,0 +1,124 @@
+# host_locks.py
+import fnmatch
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Dict, Optional, Set, Tuple
+from cancellation import CancellationToken
+
+class HostLocks:
+    """One lock per target host, leased in the shared database when given one"""
+
+    # How often a waiting ticket checks whether it was cancelled
+    CANCEL_CHECK_INTERVAL = 0.5  # seconds
+
+    def __init__(self, groups: Optional[Dict[str, str]] = None, db=None,
+                 worker_id: Optional[str] = None, lease_ttl: timedelta = timedelta(seconds=60)):
+        # fnmatch patterns of ci_name to a group of hosts that must not change
+        # at the same time, e.g. {"web-server-prod-*": "web-prod"}; the first
+        # match wins and unmatched hosts are their own group
+        self.groups = groups or {}
+        self.db = db
+        self.worker_id = worker_id
+        self.lease_ttl = lease_ttl
+        self._locks: Dict[str, Tuple[threading.Lock, int]] = {}
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def key_for(self, ci_name: str) -> str:
+        for pattern, group in self.groups.items():
+            if fnmatch.fnmatchcase(ci_name, pattern):
+                return f"group:{group}"
+        return f"host:{ci_name}"
+
+    @contextmanager
+    def hold(self, ci_name: str, cancel_token: Optional[CancellationToken] = None,
+             ticket_id: Optional[str] = None):
+        """Hold the lock of a host (or its group) for the duration of the block"""
+        key = self.key_for(ci_name)
+        with self._lock:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        started = time.monotonic()
+        contended = not lock.acquire(blocking=False)
+        try:
+            while contended and not lock.acquire(timeout=self.CANCEL_CHECK_INTERVAL):
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+        except BaseException:
+            self._leave(key)
+            raise
+        holder = ticket_id or f"{self.worker_id}/{threading.current_thread().name}"
+        try:
+            # Another process may be running a playbook on the host
+            while not self._take_lease(key, holder):
+                contended = True
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                time.sleep(self.CANCEL_CHECK_INTERVAL)
+        except BaseException:
+            lock.release()
+            self._leave(key)
+            raise
+        waited = time.monotonic() - started
+        with self._lock:
+            self.acquired += 1
+            if contended:
+                self.contended += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        try:
+            yield
+        finally:
+            try:
+                if self.db:
+                    self.db.release_host_lease(key, holder, self.worker_id)
+            finally:
+                lock.release()
+                self._leave(key)
+
+    def busy_keys(self) -> Set[str]:
+        """Keys of the hosts (or groups) that are locked or leased"""
+        with self._lock:
+            keys = set(self._locks)
+        if self.db:
+            keys.update(self.db.held_host_keys())
+        return keys
+
+    def reserve(self, ci_name: str, ticket_id: str) -> bool:
+        """Lease a ticket's host ahead of its playbook; False if another ticket holds it"""
+        return self._take_lease(self.key_for(ci_name), ticket_id)
+
+    def release(self, ci_name: str, ticket_id: str):
+        """Drop a reservation, if the ticket still holds it"""
+        if self.db:
+            self.db.release_host_lease(self.key_for(ci_name), ticket_id, self.worker_id)
+
+    def _take_lease(self, key: str, holder: str) -> bool:
+        if not self.db:
+            return True
+        return self.db.acquire_host_lease(key, holder, self.worker_id, self.lease_ttl)
+
+    def _leave(self, key: str):
+        with self._lock:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": len(self._locks),
+                "acquired": self.acquired,
+                "contended": self.contended,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds
+            }
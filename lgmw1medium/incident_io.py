@@ -0,0 +1,66 @@
+# incident_io.py
+"""Bulk export and import of incidents as NDJSON, optionally gzip-compressed"""
+import argparse
+import gzip
+import json
+import sys
+import zlib
+from typing import Any, Dict, Iterable, Iterator
+from database import IncidentDB
+
+CHUNK_SIZE = 64 * 1024
+
+
+def ndjson_chunks(incidents: Iterable[Dict[str, Any]], compress: bool = False) -> Iterator[bytes]:
+    """Encode incidents as NDJSON, yielding ~64KB chunks (gzip members if compress)"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer, size = [], 0
+    for incident in incidents:
+        line = (json.dumps(incident) + "\n").encode()
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            chunk = b"".join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b"".join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def read_ndjson(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield incidents from an NDJSON file, gunzipping .gz files"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path")
+    parser.add_argument("--db", default="incidents.db")
+    parser.add_argument("--replace", action="store_true",
+                        help="overwrite existing tickets on import")
+    args = parser.parse_args()
+
+    db = IncidentDB(args.db)
+    if args.command == "export":
+        with open(args.path, "wb") as f:
+            for chunk in ndjson_chunks(db.iter_incidents(), compress=args.path.endswith(".gz")):
+                f.write(chunk)
+        print(f"Exported incidents to {args.path}")
+    else:
+        count = db.import_incidents(read_ndjson(args.path), replace=args.replace)
+        print(f"Imported {count} incidents from {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,111 +1,493 @@
 # main.py
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
+from fastapi import FastAPI, HTTPException, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from typing import Dict, Any
-import uvicorn
+from typing import Dict, Any, Optional
 import sqlite3
 import json
 import logging
+import asyncio
+import hashlib
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
 from workflow import MiddlewareInstallationWorkflow
-from database import IncidentDB
+from database import IncidentDB, InvalidCursorError, IdempotencyKeyError, IN_PROGRESS_STATUSES
+from sharded_database import ShardedIncidentDB
+from async_database import AsyncIncidentDB
+from cache import IncidentCache
+from incident_io import ndjson_chunks
+from events import EventRelay, TicketEventBus, ticket_events
+from admission import AdmissionController, AdmissionClosed, AdmissionRejected
+from scheduler import TicketScheduler
+from host_locks import HostLocks
+from health import ReadinessProbes
+from cancellation import CancellationRegistry, DeadlineExceeded, TicketCancelled, TicketHandedOff
+
+# Audit rows older than the retention (or beyond the live row cap) are moved
+# into compressed archive files; archives are deleted after a longer retention
+AUDIT_RETENTION = timedelta(days=7)
+AUDIT_MAX_LIVE_ROWS = 1_000_000
+AUDIT_ARCHIVE_RETENTION = timedelta(days=365)
+AUDIT_ROLLOVER_INTERVAL = 3600  # seconds
+# Per-minute status transitions behind /stats?since= are kept this long
+STATS_ROLLUP_RETENTION = timedelta(days=90)
+
+# How long an Idempotency-Key replays the original /process-ticket response
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# Number of SQLite files incidents are spread over by ticket_id hash; 1 keeps
+# the single incidents.db. Fixed once data exists, as it decides placement
+DB_SHARDS = 1
+
+# Read-through cache for incident and status polling
+INCIDENT_CACHE_SIZE = 10000
+INCIDENT_CACHE_TTL = 30  # seconds
+
+# Tickets running the workflow at once in this process, tickets waiting in
+# the queue shared by all processes, and the part of the waiting places only
+# High/Critical tickets may take
+MAX_IN_FLIGHT_TICKETS = 4
+MAX_QUEUED_TICKETS = 50
+RESERVED_TICKET_CAPACITY = 10
+# Seconds a queued ticket waits before it is treated as one priority higher
+TICKET_AGING_INTERVAL = 60
+# Idle workers look for tickets queued by other processes this often
+QUEUE_POLL_INTERVAL = 0.5  # seconds
+
+# Each API process (e.g. uvicorn --workers N) reports itself alive this often;
+# tickets claimed by a process silent for WORKER_TIMEOUT are requeued
+WORKER_HEARTBEAT_INTERVAL = 10  # seconds
+WORKER_TIMEOUT = timedelta(seconds=60)
+# Status events shared between processes are only needed briefly
+TICKET_EVENT_RETENTION = timedelta(hours=1)
+
+# Playbooks run one at a time per ci_name; hosts matching a pattern here share
+# one lock with the rest of their group, e.g. {"web-server-prod-*": "web-prod"}
+HOST_GROUPS: Dict[str, str] = {}
+
+# On shutdown, running tickets get this long to finish before the rest are
+# marked resumable and handed back to the queue for another process or the
+# next start
+SHUTDOWN_DRAIN_TIMEOUT = 30  # seconds
+# Time tickets still running after the drain get to stop at their next step
+SHUTDOWN_STOP_TIMEOUT = 10  # seconds
+
+# Idle ticket event streams send a keep-alive after this many seconds
+EVENT_HEARTBEAT = 15
+
+# /readyz reports dependency checks refreshed this often in the background
+READINESS_PROBE_INTERVAL = 10  # seconds
 
 # Initialize database and logging
-db = IncidentDB()
+incident_cache = IncidentCache(max_size=INCIDENT_CACHE_SIZE, ttl=INCIDENT_CACHE_TTL)
+if DB_SHARDS > 1:
+    db = ShardedIncidentDB(shards=DB_SHARDS, cache=incident_cache)
+else:
+    db = IncidentDB(cache=incident_cache)
+# Handlers must only use the async interface so they never block the event loop
+adb = AsyncIncidentDB(db)
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+# Status transitions pushed to /incident/{ticket_id}/events subscribers,
+# including those of tickets run by other processes
+event_bus = TicketEventBus()
+event_relay = EventRelay(event_bus, db, new_worker_id())
+# Cancel requests arrive as events, from this process or relayed from others
+cancellations = CancellationRegistry()
+event_bus.add_listener(cancellations.on_event)
+admission = AdmissionController(
+    max_in_flight=MAX_IN_FLIGHT_TICKETS,
+    max_queued=MAX_QUEUED_TICKETS,
+    reserved=RESERVED_TICKET_CAPACITY
+)
+# Not ready once the shared queue is full, so new tickets go elsewhere
+readiness = ReadinessProbes(
+    db, interval=READINESS_PROBE_INTERVAL, max_queue_depth=MAX_QUEUED_TICKETS
+)
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+async def audit_rollover_loop():
+    """Periodically roll old audit rows out of the live database"""
+    while True:
+        try:
+            await adb.rollover_audit_log(
+                older_than=AUDIT_RETENTION,
+                max_live_rows=AUDIT_MAX_LIVE_ROWS
+            )
+            await adb.purge_audit_archives(older_than=AUDIT_ARCHIVE_RETENTION)
+            await adb.purge_stats_rollups(older_than=STATS_ROLLUP_RETENTION)
+            await adb.purge_idempotency_keys(older_than=IDEMPOTENCY_KEY_TTL)
+            await adb.purge_ticket_events(older_than=TICKET_EVENT_RETENTION)
+        except Exception as e:
+            logger.error(f"Audit log rollover failed: {str(e)}")
+        await asyncio.sleep(AUDIT_ROLLOVER_INTERVAL)
+
+async def worker_heartbeat_loop():
+    """Report this process alive, keep its host leases and requeue the tickets of dead ones"""
+    while True:
+        await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+        try:
+            if not await adb.heartbeat(scheduler.worker_id):
+                # Taken for dead by another process, which may have requeued
+                # our tickets; stop them before they run twice
+                running = scheduler.running_tickets()
+                for ticket_id in running:
+                    cancellations.hand_off(ticket_id)
+                logger.error(f"Worker heartbeat had timed out; stopping {len(running)} running tickets")
+            await adb.renew_host_leases(scheduler.worker_id, scheduler.running_tickets(), WORKER_TIMEOUT)
+            orphaned = await adb.release_orphaned_tickets(await adb.live_workers(WORKER_TIMEOUT))
+            if orphaned:
+                logger.warning(f"Requeued {len(orphaned)} tickets of stopped workers")
+                scheduler.notify()
+        except Exception as e:
+            logger.error(f"Worker heartbeat failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Taken here rather than at import, as forked workers share the import
+    scheduler.worker_id = event_relay.worker_id = host_locks.worker_id = new_worker_id()
+    await adb.heartbeat(scheduler.worker_id)
+    rollover_task = asyncio.create_task(audit_rollover_loop())
+    heartbeat_task = asyncio.create_task(worker_heartbeat_loop())
+    await resume_unfinished_tickets()
+    event_relay.start()
+    scheduler.start()
+    readiness.start()
+    yield
+    rollover_task.cancel()
+    heartbeat_task.cancel()
+    # Stop taking tickets, let running ones finish and hand off the rest
+    admission.close()
+    await run_in_threadpool(readiness.stop, 1)
+    unfinished = await run_in_threadpool(scheduler.drain, SHUTDOWN_DRAIN_TIMEOUT)
+    stuck = []
+    if unfinished:
+        # Each ticket stops at its next step and its worker then hands it
+        # back to the queue, so no other process can run it while it still
+        # runs here
+        for ticket_id in unfinished:
+            cancellations.hand_off(ticket_id)
+        stuck = await run_in_threadpool(scheduler.drain, SHUTDOWN_STOP_TIMEOUT)
+        logger.warning(
+            f"Shutting down with {len(unfinished) - len(stuck)} unfinished tickets handed back to the queue"
+        )
+    await run_in_threadpool(scheduler.stop, 1)
+    await run_in_threadpool(event_relay.stop, 1)
+    if stuck:
+        # Left registered, so other processes requeue these only once the
+        # heartbeat of this one has timed out
+        logger.error(f"Tickets still running at exit, requeued after WORKER_TIMEOUT: {', '.join(stuck)}")
+    else:
+        await adb.remove_worker(scheduler.worker_id)
+    adb.close()
+
+async def resume_unfinished_tickets():
+    """Requeue unfinished tickets of processes that are gone"""
+    orphaned = await adb.release_orphaned_tickets(await adb.live_workers(WORKER_TIMEOUT))
+    for ticket_id in orphaned:
+        logger.info(f"Requeued ticket {ticket_id} of a stopped worker")
+    for incident in await adb.get_unfinished_incidents():
+        ticket_id = incident["ticket_id"]
+        if incident["queued"]:
+            continue
+        if not incident["ticket_data"]:
+            error = "Interrupted before the ticket was stored for resuming; resubmit it"
+            await adb.update_incident(ticket_id, {"status": "failed", "error": error})
+            await adb.run(event_relay.publish, ticket_id, "failed", message=error)
+            continue
+        await adb.enqueue_ticket(incident["ticket_data"], resume=True)
+        logger.info(f"Resuming ticket {ticket_id} from status {incident['status']}")
+
 app = FastAPI(
     title="Multi-Agent Middleware Installation System",
     description="API for processing middleware installation tickets",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-workflow = MiddlewareInstallationWorkflow(db=db)
+# Leased in the shared database, so processes take turns on a host too
+host_locks = HostLocks(groups=HOST_GROUPS, db=db, lease_ttl=WORKER_TIMEOUT)
+workflow = MiddlewareInstallationWorkflow(
+    db=db, events=event_relay, host_locks=host_locks, cancellations=cancellations,
+    speculation_workers=MAX_IN_FLIGHT_TICKETS
+)
 
 class TicketRequest(BaseModel):
     ticket_data: Dict[str, Any]
 
+def etag_response(request: Request, body: Any) -> Response:
+    """Return body with an ETag, or 304 if the client already has it"""
+    payload = json.dumps(body, default=str)
+    etag = f'W/"{hashlib.sha1(payload.encode()).hexdigest()}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
+
 @app.post("/process-ticket")
-async def process_ticket(request: TicketRequest, background_tasks: BackgroundTasks):
-    """Process ticket with async option"""
+async def process_ticket(
+    request: TicketRequest,
+    idempotency_key: Optional[str] = Header(default=None)
+):
+    """Admit a ticket for async processing; Idempotency-Key retries get the first response"""
     try:
         ticket_id = request.ticket_data.get("ticket_id", "")
         
         if not ticket_id:
             raise HTTPException(status_code=400, detail="Ticket ID is required")
-            
-        if db.get_incident(ticket_id):
+        
+        # Replays and duplicates are answered even when the queue is full or
+        # the process is draining, and take no place in the queue
+        exists, previous = await adb.find_submission(ticket_id, idempotency_key)
+        if previous is not None:
+            return previous
+        if exists:
             raise HTTPException(status_code=400, detail=f"Ticket {ticket_id} already exists")
         
-        # Start async processing
-        background_tasks.add_task(process_ticket_async, request.ticket_data)
+        try:
+            admission.admit(request.ticket_data.get("priority"), await adb.queue_depth())
+        except AdmissionClosed as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
         
-        return {
+        response = {
             "status": "processing_started",
             "ticket_id": ticket_id,
             "message": "Ticket is being processed asynchronously"
         }
+        try:
+            created, previous = await adb.admit_incident(
+                request.ticket_data, idempotency_key=idempotency_key, response=response
+            )
+        except Exception:
+            admission.withdraw()
+            raise
+        if not created:
+            # Submitted concurrently by another request
+            admission.withdraw()
+        if previous is not None:
+            return previous
+        if not created:
+            raise HTTPException(status_code=400, detail=f"Ticket {ticket_id} already exists")
+        
+        # Queued for the workers of every process; wake one of ours
+        scheduler.notify()
+        
+        return response
         
     except HTTPException:
         raise
+    except IdempotencyKeyError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Error starting processing: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-async def process_ticket_async(ticket_data: Dict[str, Any]):
-    """Background task for processing ticket"""
+def run_ticket(ticket_data: Dict[str, Any], resume: bool = False):
+    """Process a ticket on a scheduler worker thread, off the event loop"""
+    ticket_id = ticket_data["ticket_id"]
+    # Registered before the status check so a cancellation cannot fall between
+    cancellations.token(ticket_id)
+    # The ticket may have been cancelled since it was queued, or finished by
+    # a process that stopped before taking it off the queue
+    incident = db.get_incident(ticket_id, fields=["status"])
+    if incident and incident["status"] not in IN_PROGRESS_STATUSES:
+        cancellations.release(ticket_id)
+        return
+    admission.started()
+    started = time.monotonic()
     try:
-        result = workflow.process_ticket(ticket_data)
+        result = workflow.process_ticket(ticket_data, resume=resume)
         logger.info(f"Successfully processed ticket {ticket_data['ticket_id']}")
+    except DeadlineExceeded as e:
+        logger.warning(str(e))
+        db.update_incident(ticket_id, {"status": "deadline_exceeded", "error": str(e)})
+        event_relay.publish(ticket_id, "deadline_exceeded", message=str(e))
+    except TicketHandedOff:
+        # Stopped; only now may another worker take it
+        if db.hand_off_ticket(ticket_id, scheduler.worker_id):
+            logger.info(f"Handed ticket {ticket_id} back to the queue")
+    except TicketCancelled:
+        logger.info(f"Stopped cancelled ticket {ticket_id}")
     except Exception as e:
         logger.error(f"Failed to process ticket {ticket_data['ticket_id']}: {str(e)}")
         db.update_incident(ticket_data["ticket_id"], {
             "status": "failed",
             "error": str(e)
         })
+        event_relay.publish(ticket_data["ticket_id"], "failed", message=str(e))
+    finally:
+        admission.finished(time.monotonic() - started)
+
+# Takes admitted tickets from the shared queue; one worker per in-flight slot
+scheduler = TicketScheduler(
+    db,
+    event_relay.worker_id,
+    run_ticket,
+    workers=MAX_IN_FLIGHT_TICKETS,
+    aging_interval=TICKET_AGING_INTERVAL,
+    poll_interval=QUEUE_POLL_INTERVAL,
+    # Tickets for a busy host wait in the queue, not on a worker
+    host_locks=host_locks
+)
 
 @app.get("/incident/{ticket_id}")
-async def get_incident(ticket_id: str):
-    """Get incident details with status"""
+async def get_incident(
+    request: Request,
+    ticket_id: str,
+    fields: Optional[str] = Query(default=None),
+    include_payloads: bool = Query(default=False)
+):
+    """Get incident details; fields is an optional comma-separated projection"""
     try:
-        incident = db.get_incident(ticket_id)
+        projection = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        incident = await adb.get_incident(ticket_id, fields=projection,
+                                          include_payloads=include_payloads)
         if not incident:
             raise HTTPException(status_code=404, detail="Incident not found")
-        
-        # Convert JSON strings to objects
-        incident["classification"] = json.loads(incident.get("classification", "{}"))
-        incident["execution_result"] = json.loads(incident.get("execution_result", "{}"))
-        incident["validation_report"] = json.loads(incident.get("validation_report", "{}"))
-        incident["messages"] = json.loads(incident.get("messages", "[]"))
-        
-        return incident
+        return etag_response(request, incident)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting incident: {str(e)}")
         raise HTTPException(status_code=500, detail="Error retrieving incident")
 
+@app.post("/incident/{ticket_id}/cancel")
+async def cancel_incident(ticket_id: str):
+    """Cancel an unfinished ticket wherever it runs; 409 if it already finished"""
+    cancelled, status = await adb.cancel_incident(ticket_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    if not cancelled:
+        raise HTTPException(status_code=409, detail=f"Ticket {ticket_id} already {status}")
+    await adb.run(event_relay.publish, ticket_id, "cancelled", "api", "Cancelled on request")
+    return {"ticket_id": ticket_id, "status": "cancelled", "previous_status": status}
+
+@app.get("/incident/{ticket_id}/history")
+async def get_incident_history(
+    ticket_id: str,
+    after: Optional[str] = Query(default=None),
+    limit: int = Query(default=100, gt=0, le=1000)
+):
+    """Incident timeline with node durations; pass next_after as after for the next page"""
+    try:
+        history = await adb.get_incident_history(ticket_id, after=after, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting incident history: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving incident history")
+    if not history:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return history
+
+async def subscribe_ticket(ticket_id: str):
+    """Subscribe to a ticket's events, starting from its current status"""
+    queue = event_bus.subscribe(ticket_id)
+    # Read after subscribing so no transition falls in between
+    try:
+        current = await adb.get_incident(ticket_id, fields=["status", "updated_at"])
+    except Exception:
+        event_bus.unsubscribe(ticket_id, queue)
+        raise
+    return ticket_events(event_bus, ticket_id, current, queue, EVENT_HEARTBEAT)
+
+@app.get("/incident/{ticket_id}/events")
+async def stream_incident_events(ticket_id: str):
+    """Server-Sent Events of a ticket's status transitions until it finishes"""
+    events = await subscribe_ticket(ticket_id)
+
+    async def sse():
+        try:
+            async for event in events:
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: status\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # Also reached when the client disconnects
+            await events.aclose()
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/incident/{ticket_id}/events/ws")
+async def incident_events_socket(websocket: WebSocket, ticket_id: str):
+    """WebSocket variant of the events stream; closed once the ticket finishes"""
+    await websocket.accept()
+    events = await subscribe_ticket(ticket_id)
+    try:
+        async for event in events:
+            if event is not None:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await events.aclose()
+
 @app.get("/ticket-status/{ticket_id}")
-async def get_ticket_status(ticket_id: str):
+async def get_ticket_status(request: Request, ticket_id: str):
     """Simplified status check endpoint"""
-    incident = db.get_incident(ticket_id)
+    incident = await adb.get_incident(ticket_id, fields=["status", "updated_at"])
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     
-    return {
+    return etag_response(request, {
         "ticket_id": ticket_id,
         "status": incident.get("status", "unknown"),
         "last_update": incident.get("updated_at")
-    }
+    })
 
 
 @app.get("/all-incidents")
 async def get_all_incidents(
     limit: int = Query(default=100, gt=0, le=1000),
-    skip: int = Query(default=0, ge=0)
+    skip: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None),
+    status: Optional[str] = Query(default=None),
+    environment: Optional[str] = Query(default=None),
+    priority: Optional[str] = Query(default=None),
+    middleware_type: Optional[str] = Query(default=None),
+    risk_level: Optional[str] = Query(default=None),
+    overall_status: Optional[str] = Query(default=None),
+    playbook: Optional[str] = Query(default=None)
 ):
-    """Get paginated list of all incidents"""
+    """Get paginated list of all incidents, keyset-paged when a cursor is passed"""
+    filters = {
+        "status": status, "environment": environment, "priority": priority,
+        "middleware_type": middleware_type, "risk_level": risk_level,
+        "overall_status": overall_status, "playbook": playbook
+    }
     try:
-        incidents = db.get_all_incidents(limit=limit, skip=skip)
+        if cursor is not None:
+            incidents, next_cursor = await adb.get_incidents_page(limit=limit, cursor=cursor, **filters)
+            return {"incidents": incidents, "next_cursor": next_cursor}
+        incidents = await adb.get_all_incidents(limit=limit, skip=skip, **filters)
         return incidents
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         logger.error(f"Database error getting all incidents: {str(e)}")
         raise HTTPException(
@@ -120,20 +502,108 @@ async def get_all_incidents(
         )
 
 
-@app.get("/health")
-async def health_check():
-    """Health check with DB verification"""
+@app.get("/incidents/search")
+async def search_incidents(
+    q: str = Query(min_length=1, description="Terms to match; end a term with * for a prefix, e.g. app-server-staging-*"),
+    limit: int = Query(default=20, gt=0, le=100),
+    offset: int = Query(default=0, ge=0)
+):
+    """Full-text search over descriptions, CI names, messages and errors, best match first"""
     try:
-        db.get_incident("healthcheck")  # Test DB connection
-        return {
-            "status": "healthy",
-            "service": "multi-agent-middleware-system",
-            "database": "connected"
-        }
+        results, next_offset = await adb.search_incidents(q, limit=limit, offset=offset)
+        return {"results": results, "next_offset": next_offset}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error searching incidents: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
+
+
+@app.get("/incidents/export")
+async def export_incidents(
+    compress: Optional[str] = Query(default=None, pattern="^gzip$"),
+    status: Optional[str] = Query(default=None),
+    environment: Optional[str] = Query(default=None),
+    priority: Optional[str] = Query(default=None)
+):
+    """Stream all (or filtered) incidents as NDJSON, gzipped with compress=gzip"""
+    filters = {"status": status, "environment": environment, "priority": priority}
+    # A sync iterator, so the response drains the DB cursor in the threadpool
+    chunks = ndjson_chunks(db.iter_incidents(**filters), compress=compress == "gzip")
+    if compress:
+        return StreamingResponse(
+            chunks,
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="incidents.ndjson.gz"'}
+        )
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+
+@app.get("/stats")
+async def get_stats(
+    since: Optional[str] = Query(default=None, description="ISO minute, e.g. 2024-12-07T00:00; defaults to today"),
+    per_minute: bool = Query(default=False)
+):
+    """Incident counts and status transitions since a minute, from maintained counters"""
+    try:
+        return await adb.get_stats(since=since, per_minute=per_minute)
     except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
+        logger.error(f"Error getting stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving statistics")
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Runtime metrics of the API process"""
+    return {
+        "incident_cache": incident_cache.stats(),
+        "group_commit": db.group_commit_stats(),
+        "worker_id": scheduler.worker_id,
+        "ticket_events": {**event_bus.stats(), **event_relay.stats()},
+        "admission": admission.stats(),
+        "scheduler": scheduler.stats(),
+        "host_locks": host_locks.stats(),
+        "cancellations": cancellations.stats(),
+        "speculation": workflow.speculation_stats()
+    }
+
+
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process answers; touches no dependency"""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness_check():
+    """Readiness from the cached background checks; 503 when not ready"""
+    ready, checks = readiness.status()
+    if admission.closed:
+        ready = False
+        checks = {**checks, "admission": {"ok": False, "detail": "Shutting down"}}
+    body = {"status": "ready" if ready else "not_ready", "checks": checks}
+    return body if ready else JSONResponse(status_code=503, content=body)
+
+
+@app.get("/health")
+async def health_check():
+    """Health check with DB verification, from the cached readiness checks"""
+    _, checks = readiness.status()
+    database = checks.get("database")
+    if not database or not database["ok"]:
+        detail = database["detail"] if database else checks["probes"]["detail"]
+        raise HTTPException(status_code=503, detail=f"Service unavailable: {detail}")
+    return {
+        "status": "healthy",
+        "service": "multi-agent-middleware-system",
+        "database": "connected"
+    }
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(
         app, 
         host="0.0.0.0", 
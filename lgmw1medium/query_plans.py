@@ -0,0 +1,95 @@
+# query_plans.py
+"""Exit non-zero if any IncidentDB query runs without an index"""
+import json
+import sys
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from database import IncidentDB, FILTER_COLUMNS, encode_cursor
+from mock_data import MOCK_TICKETS
+
+# One representative value per listing filter
+SAMPLE_FILTERS = {
+    "status": "classified",
+    "environment": "production",
+    "priority": "High",
+    "middleware_type": "apache",
+    "risk_level": "high",
+    "overall_status": "success",
+    "playbook": "apache_install.yml",
+}
+
+
+def exercise(db: IncidentDB):
+    """Call every IncidentDB query path once"""
+    ticket = MOCK_TICKETS[0]
+    db.create_incident(ticket)
+    db.admit_incident(dict(ticket, ticket_id="ADMIT-1"), idempotency_key="key-1", response={})
+    db.admit_incident(dict(ticket, ticket_id="ADMIT-1"), idempotency_key="key-1", response={})
+    db.find_submission("ADMIT-1", idempotency_key="key-1")
+    db.find_submission("ADMIT-2")
+    db.update_incident(ticket["ticket_id"], {"status": "classified"})
+    db.log_audit(ticket["ticket_id"], "ticket_classified", "ticket_classifier", "{}")
+    db.get_incident(ticket["ticket_id"])
+    db.get_incident(ticket["ticket_id"], fields=["status", "updated_at"])
+    db.update_incident(ticket["ticket_id"], {
+        "execution_result": json.dumps({"status": "success", "logs": "x" * 10000})
+    })
+    db.get_incident(ticket["ticket_id"], include_payloads=True)
+    db.get_payload(ticket["ticket_id"], "execution_result.logs")
+    db.get_all_incidents(limit=10, skip=0)
+    db.get_all_incidents(limit=10, skip=10, status="classified")
+    _, next_cursor = db.get_incidents_page(limit=10)
+    cursor = next_cursor or encode_cursor("9999-12-31T00:00:00", 0)
+    db.get_incidents_page(limit=10, cursor=cursor)
+    for column in FILTER_COLUMNS:
+        db.get_incidents_page(limit=10, cursor=cursor, **{column: SAMPLE_FILTERS[column]})
+    exported = list(db.iter_incidents(environment="production"))
+    db.import_incidents(exported)
+    db.import_incidents(exported, replace=True)
+    db.get_stats()
+    db.search_incidents("apache web-server-prod-*", limit=10, offset=0)
+    db.rollover_audit_log(older_than=timedelta(days=7), max_live_rows=0)
+    db.get_audit_log(ticket["ticket_id"])
+    db.get_incident_history(ticket["ticket_id"], limit=10)
+    db.get_incident_history(ticket["ticket_id"], after=encode_cursor("2024-12-07T00:00:00", 1), limit=10)
+    db.purge_audit_archives(older_than=timedelta(days=90))
+    db.purge_stats_rollups(older_than=timedelta(days=90))
+    db.purge_idempotency_keys(older_than=timedelta(days=1))
+    db.get_unfinished_incidents()
+    db.enqueue_ticket(ticket, resume=True)
+    db.queue_depth()
+    db.queued_tickets()
+    db.heartbeat("worker-1")
+    db.claim_ticket("ADMIT-1", "worker-1")
+    db.hand_off_ticket("ADMIT-1", "worker-1")
+    db.claim_ticket("ADMIT-1", "worker-2")
+    db.acquire_host_lease("host:web-server-prod-01", "ADMIT-1", "worker-2", timedelta(seconds=60))
+    db.renew_host_leases("worker-2", ["ADMIT-1"], timedelta(seconds=60))
+    db.held_host_keys()
+    db.release_host_lease("host:web-server-prod-01", "ADMIT-1", "worker-2")
+    db.release_orphaned_tickets(db.live_workers(timedelta(seconds=60)))
+    db.complete_ticket("ADMIT-1", "worker-1")
+    db.remove_worker("worker-1")
+    event_id = db.record_ticket_event({
+        "ticket_id": ticket["ticket_id"], "status": "classified", "timestamp": "2024-12-07T00:00:00"
+    }, "worker-1")
+    db.ticket_events_after(event_id - 1)
+    db.last_ticket_event_id()
+    db.purge_ticket_events(older_than=timedelta(hours=1))
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = IncidentDB(str(Path(tmp) / "plans.db"), explain=True)
+        exercise(db)
+
+    full_scans = [entry for entry in db.query_plans if entry["full_scan"]]
+    print(f"\n{len(db.query_plans)} queries explained, {len(full_scans)} without index")
+    for entry in full_scans:
+        print(f"  FULL SCAN: {entry['query']}")
+    return 1 if full_scans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# scheduler.py
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# ServiceNow priorities, most urgent first
+PRIORITY_CLASSES = ("Critical", "High", "Medium", "Low")
+DEFAULT_PRIORITY = "Medium"
+
+# Share of dispatches each environment gets while several have work queued
+ENVIRONMENT_WEIGHTS = {"production": 4, "staging": 2, "dev": 1}
+
+class TicketScheduler:
+    """Runs tickets from the shared queue on worker threads, most urgent first"""
+
+    def __init__(self, db, worker_id: str, handler: Callable[..., Any], workers: int = 4,
+                 environment_weights: Optional[Dict[str, int]] = None,
+                 aging_interval: float = 60.0, poll_interval: float = 0.5, host_locks=None):
+        self.db = db
+        self.worker_id = worker_id
+        self.handler = handler
+        self.workers = workers
+        self.environment_weights = environment_weights or ENVIRONMENT_WEIGHTS
+        self.aging_interval = aging_interval
+        self.poll_interval = poll_interval
+        self.host_locks = host_locks
+        self.logger = logging.getLogger(__name__ + ".TicketScheduler")
+        # Stride scheduling: the environment with the lowest pass goes next
+        self._passes: Dict[str, float] = {}
+        # Environments with tickets waiting at the last look at the queue
+        self._waiting: Set[str] = set()
+        self._queued = {priority: 0 for priority in PRIORITY_CLASSES}
+        # Serializes this process's claims, which also guards the passes
+        self._claim_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._notified = 0
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._waits = {
+            priority: {"count": 0, "total": 0.0, "max": 0.0}
+            for priority in PRIORITY_CLASSES
+        }
+        # Ticket ids being processed, by worker thread name
+        self._running: Dict[str, str] = {}
+        self.dispatched = 0
+        # Picks passed over because their host was busy
+        self.host_busy_skips = 0
+
+    def priority_class(self, priority: Optional[str]) -> int:
+        names = [p.lower() for p in PRIORITY_CLASSES]
+        priority = str(priority or "").lower()
+        return names.index(priority) if priority in names else PRIORITY_CLASSES.index(DEFAULT_PRIORITY)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def running_tickets(self) -> List[str]:
+        """Ids of the tickets this process's workers are processing"""
+        with self._condition:
+            return list(self._running.values())
+
+    def notify(self):
+        """Wake an idle worker; call after queueing a ticket in this process"""
+        with self._condition:
+            self._notified += 1
+            self._condition.notify()
+
+    def start(self):
+        with self._condition:
+            self._stopping = False
+        for _ in range(self.workers - len(self._threads)):
+            thread = threading.Thread(
+                target=self._run, name=f"ticket-worker-{len(self._threads)}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the workers once they finish their current ticket"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+
+    def drain(self, timeout: float) -> List[str]:
+        """Stop claiming tickets and wait up to timeout; returns the tickets still running"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            while self._running and time.monotonic() < deadline:
+                self._condition.wait(deadline - time.monotonic())
+            return list(self._running.values())
+
+    def _run(self):
+        worker = threading.current_thread().name
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+            try:
+                claimed = self._claim_next()
+            except Exception as e:
+                self.logger.error(f"Claiming a ticket failed: {str(e)}")
+                claimed = None
+            if claimed is None:
+                with self._condition:
+                    if not self._stopping and not self._notified:
+                        self._condition.wait(self.poll_interval)
+                    self._notified = max(0, self._notified - 1)
+                continue
+            ticket_data, resume = claimed
+            ticket_id = ticket_data.get("ticket_id")
+            with self._condition:
+                self._running[worker] = ticket_id
+            try:
+                self.handler(ticket_data, resume=resume)
+            except Exception as e:
+                self.logger.error(f"Ticket {ticket_id} failed: {str(e)}")
+            finally:
+                self._release_host(ticket_data)
+                try:
+                    # A no-op when the ticket was handed back to the queue
+                    self.db.complete_ticket(ticket_id, self.worker_id)
+                except Exception as e:
+                    self.logger.error(f"Could not dequeue ticket {ticket_id}: {str(e)}")
+                with self._condition:
+                    del self._running[worker]
+                    self._condition.notify_all()
+
+    def _claim_next(self) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """Claim the most urgent waiting ticket, or None if there is none"""
+        with self._claim_lock:
+            waiting = self.db.queued_tickets()
+            self._observe(waiting)
+            busy = self.host_locks.busy_keys() if self.host_locks else set()
+            now = time.time()
+            for ticket in sorted(waiting, key=lambda ticket: self._rank(ticket, now)):
+                if not self._reserve_host(ticket, busy):
+                    self.host_busy_skips += 1
+                    continue
+                claimed = self.db.claim_ticket(ticket["ticket_id"], self.worker_id)
+                if claimed is None:
+                    self._release_host(ticket)
+                    continue  # Taken by a worker of another process
+                environment = ticket["environment"]
+                self._passes[environment] += 1.0 / self.environment_weights.get(environment, 1)
+
+                priority = PRIORITY_CLASSES[self.priority_class(ticket["priority"])]
+                waits = self._waits[priority]
+                waited = max(0.0, now - datetime.fromisoformat(ticket["enqueued_at"]).timestamp())
+                waits["count"] += 1
+                waits["total"] += waited
+                waits["max"] = max(waits["max"], waited)
+                self._queued[priority] -= 1
+                self.dispatched += 1
+                return claimed
+        return None
+
+    def _reserve_host(self, ticket: Dict[str, Any], busy: Set[str]) -> bool:
+        """Reserve the host of a ticket about to be claimed, unless it is busy"""
+        if not self.host_locks or not ticket.get("ci_name"):
+            return True
+        if self.host_locks.key_for(ticket["ci_name"]) in busy:
+            return False
+        return self.host_locks.reserve(ticket["ci_name"], ticket["ticket_id"])
+
+    def _release_host(self, ticket: Dict[str, Any]):
+        if not self.host_locks or not ticket.get("ci_name"):
+            return
+        try:
+            self.host_locks.release(ticket["ci_name"], ticket["ticket_id"])
+        except Exception as e:
+            self.logger.error(f"Could not release the host of ticket {ticket['ticket_id']}: {str(e)}")
+
+    def _observe(self, waiting: List[Dict[str, Any]]):
+        """Track the waiting tickets; called with the claim lock held"""
+        environments = {ticket["environment"] for ticket in waiting}
+        # An environment coming back from idle starts level with the busy
+        # ones instead of catching up on the dispatches it missed
+        busy = [self._passes[environment] for environment in environments & self._waiting]
+        for environment in environments - self._waiting:
+            self._passes[environment] = max(
+                self._passes.get(environment, 0.0), min(busy, default=0.0)
+            )
+        self._waiting = environments
+        queued = {priority: 0 for priority in PRIORITY_CLASSES}
+        for ticket in waiting:
+            queued[PRIORITY_CLASSES[self.priority_class(ticket["priority"])]] += 1
+        self._queued = queued
+
+    def _rank(self, ticket: Dict[str, Any], now: float) -> Tuple[int, float, str]:
+        enqueued_at = datetime.fromisoformat(ticket["enqueued_at"]).timestamp()
+        # Each aging interval waited counts as one class more urgent
+        effective = max(0, self.priority_class(ticket["priority"])
+                        - int((now - enqueued_at) / self.aging_interval))
+        return effective, self._passes[ticket["environment"]], ticket["enqueued_at"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "worker_id": self.worker_id,
+                "workers": self.workers,
+                "running": self.running,
+                "dispatched": self.dispatched,
+                "host_busy_skips": self.host_busy_skips,
+                "queued": dict(self._queued),
+                "wait_seconds": {
+                    priority: {
+                        "count": waits["count"],
+                        "avg": waits["total"] / waits["count"] if waits["count"] else 0.0,
+                        "max": waits["max"]
+                    }
+                    for priority, waits in self._waits.items()
+                }
+            }
@@ -0,0 +1,287 @@
+# sharded_database.py
+import base64
+import heapq
+import json
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from cache import IncidentCache
+from database import IncidentDB, IncidentUnitOfWork, InvalidCursorError, encode_cursor, summarize_stats
+
+class ShardedIncidentDB:
+    """IncidentDB spread over N SQLite files by a stable hash of the ticket_id"""
+
+    def __init__(self, db_path: str = "incidents.db", shards: int = 4,
+                 cache: Optional[IncidentCache] = None, **options):
+        if shards < 1:
+            raise ValueError("At least one shard is required")
+        base = Path(db_path)
+        self.cache = cache
+        # The shard count is part of the file names (incidents.0-of-4.db), as
+        # changing it would move tickets to other shards
+        self.shards = [
+            IncidentDB(
+                str(base.with_name(f"{base.stem}.{index}-of-{shards}{base.suffix}")),
+                cache=cache,
+                archive_dir=str(base.parent / "audit_archive" / f"shard_{index}"),
+                **options
+            )
+            for index in range(shards)
+        ]
+
+    def shard_index(self, ticket_id: str) -> int:
+        return zlib.crc32(ticket_id.encode()) % len(self.shards)
+
+    def shard_for(self, ticket_id: str) -> IncidentDB:
+        """The shard that owns a ticket"""
+        return self.shards[self.shard_index(ticket_id)]
+
+    def check_writable(self):
+        for shard in self.shards:
+            shard.check_writable()
+
+    # Single-ticket operations go to the owning shard
+
+    def create_incident(self, ticket_data: Dict[str, Any]) -> int:
+        return self.shard_for(ticket_data["ticket_id"]).create_incident(ticket_data)
+
+    def admit_incident(self, ticket_data: Dict[str, Any], idempotency_key: Optional[str] = None,
+                       response: Optional[Dict[str, Any]] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Admit on the ticket's shard, which also holds its idempotency keys"""
+        # A key reused for a ticket on another shard is not detected
+        return self.shard_for(ticket_data["ticket_id"]).admit_incident(
+            ticket_data, idempotency_key, response
+        )
+
+    def find_submission(self, ticket_id: str,
+                        idempotency_key: Optional[str] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        return self.shard_for(ticket_id).find_submission(ticket_id, idempotency_key)
+
+    def cancel_incident(self, ticket_id: str, agent: str = "api") -> Tuple[bool, Optional[str]]:
+        return self.shard_for(ticket_id).cancel_incident(ticket_id, agent)
+
+    def update_incident(self, ticket_id: str, updates: Dict[str, Any]):
+        return self.shard_for(ticket_id).update_incident(ticket_id, updates)
+
+    def log_audit(self, ticket_id: str, action: str, agent: str, details: str):
+        return self.shard_for(ticket_id).log_audit(ticket_id, action, agent, details)
+
+    def get_incident(self, ticket_id: str, fields: Optional[List[str]] = None,
+                     include_payloads: bool = False) -> Dict[str, Any]:
+        return self.shard_for(ticket_id).get_incident(ticket_id, fields=fields,
+                                                      include_payloads=include_payloads)
+
+    def get_payload(self, ticket_id: str, field: str) -> Any:
+        return self.shard_for(ticket_id).get_payload(ticket_id, field)
+
+    def get_audit_log(self, ticket_id: str) -> List[Dict[str, Any]]:
+        return self.shard_for(ticket_id).get_audit_log(ticket_id)
+
+    def get_incident_history(self, ticket_id: str, after: Optional[str] = None,
+                             limit: int = 100) -> Optional[Dict[str, Any]]:
+        return self.shard_for(ticket_id).get_incident_history(ticket_id, after, limit)
+
+    def unit_of_work(self, ticket_id: str, mode: Optional[str] = None) -> IncidentUnitOfWork:
+        return self.shard_for(ticket_id).unit_of_work(ticket_id, mode)
+
+    # Listings and maintenance fan out to every shard
+
+    def get_all_incidents(self, limit: int = 100, skip: int = 0, **filters) -> list[dict]:
+        """Offset pagination; every shard returns skip + limit rows to merge"""
+        per_shard = [
+            shard.get_all_incidents(limit=skip + limit, skip=0, **filters)
+            for shard in self.shards
+        ]
+        merged = heapq.merge(*per_shard, key=lambda row: row["created_at"], reverse=True)
+        return list(merged)[skip:skip + limit]
+
+    def get_incidents_page(self, limit: int = 100, cursor: Optional[str] = None,
+                           **filters) -> Tuple[list[dict], Optional[str]]:
+        """Keyset pagination merged across shards, the cursor holding each shard's position"""
+        positions = self._decode_positions(cursor)
+        fetched = []
+        for index, shard in enumerate(self.shards):
+            if positions[index] is False:
+                fetched.append([])
+                continue
+            rows = shard._select_page(limit + 1, positions[index], **filters)
+            fetched.append([dict(row, shard=index) for row in rows])
+
+        merged = heapq.merge(
+            *fetched,
+            key=lambda row: (row["created_at"], row["shard"], row["id"]),
+            reverse=True
+        )
+        page = [row for _, row in zip(range(limit), merged)]
+
+        consumed = [0] * len(self.shards)
+        for row in page:
+            consumed[row["shard"]] += 1
+            positions[row["shard"]] = encode_cursor(row["created_at"], row["id"])
+        for index, rows in enumerate(fetched):
+            # Less than a full read and all of it returned: nothing left here
+            if positions[index] is not False and consumed[index] == len(rows) <= limit:
+                positions[index] = False
+
+        next_cursor = None
+        if any(position is not False for position in positions):
+            next_cursor = self._encode_positions(positions)
+        for row in page:
+            del row["id"], row["shard"]
+        return page, next_cursor
+
+    def search_incidents(self, query: str, limit: int = 20,
+                         offset: int = 0) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Full-text search merged across shards by rank (lower is better)"""
+        per_shard = [
+            shard.search_incidents(query, limit=offset + limit + 1, offset=0)[0]
+            for shard in self.shards
+        ]
+        merged = list(heapq.merge(*per_shard, key=lambda row: row["rank"]))
+        results = merged[offset:offset + limit]
+        next_offset = offset + limit if len(merged) > offset + limit else None
+        return results, next_offset
+
+    def iter_incidents(self, batch_size: int = 1000, **filters) -> Iterator[Dict[str, Any]]:
+        """Stream every shard in turn"""
+        for shard in self.shards:
+            yield from shard.iter_incidents(batch_size=batch_size, **filters)
+
+    def import_incidents(self, incidents: Iterable[Dict[str, Any]],
+                         batch_size: int = 5000, replace: bool = False) -> int:
+        """Route rows to their shards, importing each shard's rows in batches"""
+        pending: Dict[int, List[Dict[str, Any]]] = {index: [] for index in range(len(self.shards))}
+        written = 0
+        for incident in incidents:
+            index = self.shard_index(incident["ticket_id"])
+            pending[index].append(incident)
+            if len(pending[index]) >= batch_size:
+                written += self.shards[index].import_incidents(pending[index], batch_size, replace)
+                pending[index] = []
+        for index, rows in pending.items():
+            if rows:
+                written += self.shards[index].import_incidents(rows, batch_size, replace)
+        return written
+
+    def get_unfinished_incidents(self) -> List[Dict[str, Any]]:
+        rows = [row for shard in self.shards for row in shard.get_unfinished_incidents()]
+        return sorted(rows, key=lambda row: row["created_at"])
+
+    # Each shard queues its own tickets; worker heartbeats and relayed
+    # events are process-wide and kept in the first shard
+
+    def enqueue_ticket(self, ticket_data: Dict[str, Any], resume: bool = False) -> bool:
+        return self.shard_for(ticket_data["ticket_id"]).enqueue_ticket(ticket_data, resume)
+
+    def queued_tickets(self) -> List[Dict[str, Any]]:
+        return [ticket for shard in self.shards for ticket in shard.queued_tickets()]
+
+    def queue_depth(self) -> int:
+        return sum(shard.queue_depth() for shard in self.shards)
+
+    def claim_ticket(self, ticket_id: str, worker_id: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        return self.shard_for(ticket_id).claim_ticket(ticket_id, worker_id)
+
+    def complete_ticket(self, ticket_id: str, worker_id: str) -> bool:
+        return self.shard_for(ticket_id).complete_ticket(ticket_id, worker_id)
+
+    def hand_off_ticket(self, ticket_id: str, worker_id: str, agent: str = "shutdown") -> bool:
+        return self.shard_for(ticket_id).hand_off_ticket(ticket_id, worker_id, agent)
+
+    def release_orphaned_tickets(self, live_workers: List[str]) -> List[str]:
+        return [
+            ticket_id for shard in self.shards
+            for ticket_id in shard.release_orphaned_tickets(live_workers)
+        ]
+
+    def heartbeat(self, worker_id: str) -> bool:
+        return self.shards[0].heartbeat(worker_id)
+
+    def live_workers(self, timeout: timedelta) -> List[str]:
+        return self.shards[0].live_workers(timeout)
+
+    def remove_worker(self, worker_id: str):
+        self.shards[0].remove_worker(worker_id)
+
+    def acquire_host_lease(self, key: str, ticket_id: str, worker_id: str, ttl: timedelta) -> bool:
+        return self.shards[0].acquire_host_lease(key, ticket_id, worker_id, ttl)
+
+    def release_host_lease(self, key: str, ticket_id: str, worker_id: str):
+        self.shards[0].release_host_lease(key, ticket_id, worker_id)
+
+    def held_host_keys(self) -> List[str]:
+        return self.shards[0].held_host_keys()
+
+    def renew_host_leases(self, worker_id: str, ticket_ids: List[str], ttl: timedelta) -> int:
+        return self.shards[0].renew_host_leases(worker_id, ticket_ids, ttl)
+
+    def record_ticket_event(self, event: Dict[str, Any], worker_id: str) -> int:
+        return self.shards[0].record_ticket_event(event, worker_id)
+
+    def ticket_events_after(self, after: int, limit: int = 500) -> List[Dict[str, Any]]:
+        return self.shards[0].ticket_events_after(after, limit)
+
+    def last_ticket_event_id(self) -> int:
+        return self.shards[0].last_ticket_event_id()
+
+    def purge_ticket_events(self, older_than: timedelta) -> int:
+        return self.shards[0].purge_ticket_events(older_than)
+
+    def get_stats(self, since: Optional[str] = None, per_minute: bool = False) -> Dict[str, Any]:
+        """Sum every shard's counters and rollups"""
+        since = since or datetime.now().strftime("%Y-%m-%dT00:00")
+        counters, rollups = [], []
+        for shard in self.shards:
+            shard_counters, shard_rollups = shard._stats_rows(since)
+            counters.extend(shard_counters)
+            rollups.extend(shard_rollups)
+        return summarize_stats(counters, rollups, since, per_minute)
+
+    def _encode_positions(self, positions: List[Any]) -> str:
+        raw = json.dumps(positions).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def _decode_positions(self, cursor: Optional[str]) -> List[Any]:
+        if not cursor:
+            return [None] * len(self.shards)
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            positions = json.loads(raw)
+            if not isinstance(positions, list) or len(positions) != len(self.shards):
+                raise ValueError
+            if not all(p is None or p is False or isinstance(p, str) for p in positions):
+                raise ValueError
+            return positions
+        except Exception:
+            raise InvalidCursorError(f"Invalid cursor: {cursor}")
+
+    def rollover_audit_log(self, older_than: Optional[timedelta] = None,
+                           max_live_rows: Optional[int] = None,
+                           batch_size: int = 10000) -> int:
+        """Roll over every shard; max_live_rows is the total across shards"""
+        per_shard_rows = None
+        if max_live_rows is not None:
+            per_shard_rows = max_live_rows // len(self.shards)
+        return sum(
+            shard.rollover_audit_log(older_than, per_shard_rows, batch_size)
+            for shard in self.shards
+        )
+
+    def purge_audit_archives(self, older_than: timedelta) -> int:
+        return sum(shard.purge_audit_archives(older_than) for shard in self.shards)
+
+    def purge_stats_rollups(self, older_than: timedelta) -> int:
+        return sum(shard.purge_stats_rollups(older_than) for shard in self.shards)
+
+    def purge_idempotency_keys(self, older_than: timedelta) -> int:
+        return sum(shard.purge_idempotency_keys(older_than) for shard in self.shards)
+
+    def group_commit_stats(self) -> Optional[Dict[str, int]]:
+        stats = [shard.group_commit_stats() for shard in self.shards]
+        if not any(stats):
+            return None
+        return {
+            key: sum(shard_stats[key] for shard_stats in stats if shard_stats)
+            for key in ("commits", "flushes")
+        }
@@ -0,0 +1,64 @@
+# startup_time.py
+"""Exit non-zero if importing the API exceeds its time budget or loads deferred modules"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+# Loaded on first use (LLM clients, workflow graph) or only by other entry points
+DEFERRED_MODULES = ("langgraph", "langchain_ollama", "langchain_core", "requests", "uvicorn")
+
+# Cumulative import time of main, in seconds
+IMPORT_BUDGET = 1.0
+
+
+def import_times(module: str = "main") -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every module imported with it"""
+    source_dir = Path(__file__).resolve().parent
+    with tempfile.TemporaryDirectory() as workdir:
+        # Run elsewhere so importing cannot leave files in the source tree
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=workdir,
+            env={**os.environ, "PYTHONPATH": str(source_dir)},
+            capture_output=True,
+            text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET, help="seconds")
+    args = parser.parse_args()
+
+    times = import_times()
+    total = next(cumulative for name, _, cumulative in times if name == "main") / 1e6
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(times, key=lambda t: t[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+
+    deferred = sorted({
+        name for name, _, _ in times
+        if name.split(".")[0] in DEFERRED_MODULES
+    })
+    print(f"\nimport main: {total:.3f}s (budget {args.budget:.3f}s)")
+    if deferred:
+        print("Imported at startup but should be deferred: " + ", ".join(deferred))
+    return 1 if total > args.budget or deferred else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
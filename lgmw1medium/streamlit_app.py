@@ -8,7 +8,9 @@ from datetime import datetime
 # Configuration
 BACKEND_URL = "http://localhost:8000"
 TIMEOUT = 120  # seconds
-POLL_INTERVAL = 5  # seconds
+# The events stream sends a keep-alive every 15 seconds while idle
+EVENT_READ_TIMEOUT = 30  # seconds
+STATUS_PROGRESS = {"received": 20, "classified": 40, "executed": 60, "validated": 80}
 
 st.set_page_config(page_title="Middleware Installation System", layout="wide")
 st.title("🤖 Multi-Agent Middleware Installation System")
@@ -84,48 +86,50 @@ with col2:
                     st.success("✅ Processing started successfully!")
                     start_response = response.json()
                     
-                    # Poll for status updates
+                    # Follow status transitions pushed by the backend
                     status_placeholder = st.empty()
                     progress_bar = st.progress(0)
                     status_details = st.empty()
+                    final_event = None
+                    deadline = time.monotonic() + TIMEOUT
                     
-                    for i in range(int(TIMEOUT/POLL_INTERVAL)):
-                        status_response = requests.get(
-                            f"{BACKEND_URL}/ticket-status/{ticket_id}",
-                            timeout=5
-                        )
-                        
-                        if status_response.status_code == 200:
-                            status = status_response.json()
-                            progress = min(95, (i+1)*5)  # Cap progress at 95%
-                            progress_bar.progress(progress)
-                            
-                            if status["status"] == "completed":
-                                progress_bar.progress(100)
-                                status_placeholder.success("✅ Processing completed!")
-                                # Get full results
-                                incident = requests.get(
-                                    f"{BACKEND_URL}/incident/{ticket_id}",
-                                    timeout=5
-                                ).json()
-                                
-                                # Display results
-                                st.subheader("📊 Execution Flow")
-                                for msg in incident.get("messages", []):
-                                    st.write(f"- {msg}")
-                                
-                                st.success(f"🎉 Final status: {incident.get('status')}")
+                    with requests.get(
+                        f"{BACKEND_URL}/incident/{ticket_id}/events",
+                        stream=True,
+                        timeout=(5, EVENT_READ_TIMEOUT)
+                    ) as events:
+                        for line in events.iter_lines(decode_unicode=True):
+                            if time.monotonic() > deadline:
                                 break
-                            elif status["status"] == "failed":
-                                progress_bar.progress(100)
-                                status_placeholder.error("❌ Processing failed")
-                                st.error(incident.get("error", "Unknown error"))
+                            if not line or not line.startswith("data:"):
+                                continue  # keep-alives and event names
+                            event = json.loads(line[len("data:"):])
+                            progress_bar.progress(STATUS_PROGRESS.get(event["status"], 100))
+                            if event["status"] in ("success", "failed", "cancelled", "deadline_exceeded"):
+                                final_event = event
                                 break
-                            else:
-                                status_placeholder.info(f"🔄 Processing... ({status['status']})")
-                                status_details.text(f"Last update: {status['last_update']}")
+                            status_placeholder.info(f"🔄 Processing... ({event['status']})")
+                            status_details.text(f"Last update: {event['timestamp']}")
+                    
+                    if final_event and final_event["status"] == "success":
+                        status_placeholder.success("✅ Processing completed!")
+                        # Get full results
+                        incident = requests.get(
+                            f"{BACKEND_URL}/incident/{ticket_id}",
+                            timeout=5
+                        ).json()
                         
-                        time.sleep(POLL_INTERVAL)
+                        # Display results
+                        st.subheader("📊 Execution Flow")
+                        for msg in incident.get("messages", []):
+                            st.write(f"- {msg}")
+                        
+                        st.success(f"🎉 Final status: {incident.get('status')}")
+                    elif final_event and final_event["status"] == "cancelled":
+                        status_placeholder.warning("🚫 Ticket cancelled")
+                    elif final_event:
+                        status_placeholder.error("❌ Processing failed")
+                        st.error(final_event.get("message") or "Unknown error")
                     else:
                         progress_bar.progress(100)
                         status_placeholder.warning("⚠️ Processing is taking longer than expected")
@@ -199,7 +203,7 @@ st.subheader("📂 All Tickets in System")
 col1, col2, col3 = st.columns(3)
 with col1:
     filter_status = st.selectbox("Filter by Status", 
-                               ["All", "received", "processing", "completed", "failed"])
+                               ["All", "received", "processing", "completed", "failed", "cancelled", "deadline_exceeded"])
 with col2:
     filter_priority = st.selectbox("Filter by Priority",
                                  ["All", "Low", "Medium", "High", "Critical"])
@@ -210,24 +214,21 @@ if st.button("Refresh Ticket List", key="refresh_tickets"):
     st.rerun()
 
 try:
-    # Get all incidents from backend
+    # Get filtered incidents from backend
+    params = {"limit": limit_tickets}
+    if filter_status != "All":
+        params["status"] = filter_status
+    if filter_priority != "All":
+        params["priority"] = filter_priority
     response = requests.get(
         f"{BACKEND_URL}/all-incidents",
+        params=params,
         timeout=5
     )
     
     if response.status_code == 200:
         all_tickets = response.json()
         
-        # Apply filters
-        if filter_status != "All":
-            all_tickets = [t for t in all_tickets if t.get("status") == filter_status]
-        if filter_priority != "All":
-            all_tickets = [t for t in all_tickets if t.get("priority") == filter_priority]
-        
-        # Limit number of tickets
-        all_tickets = all_tickets[:limit_tickets]
-        
         if not all_tickets:
             st.info("No tickets match the current filters")
         else:
@@ -1,19 +1,14 @@
 # ticket_classifier.py
-from langchain_ollama import OllamaLLM
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
 import re
 from ticket_receiver import ServiceNowTicket
+from cancellation import LLM_TIMEOUT, CancellationToken, TicketCancelled, invoke_llm
 
 class TicketClassifier:
     def __init__(self):
         self.name = "ticket_classifier"
-        self.llm = OllamaLLM(
-            model="llama3",
-            timeout=300,
-            temperature=0.3,
-            format="json"
-        )
+        self._llm = None
         # Template for consistent JSON output
         self.json_template = """{
             "middleware_type": "apache",
@@ -24,7 +19,26 @@ class TicketClassifier:
             "estimated_duration": "30min"
         }"""
     
-    def classify_ticket(self, ticket: ServiceNowTicket) -> Dict[str, Any]:
+    @property
+    def llm(self):
+        """Ollama client, built on first use as langchain_ollama is slow to import"""
+        if self._llm is None:
+            from langchain_ollama import OllamaLLM
+            self._llm = OllamaLLM(
+                model="llama3",
+                # Requests of tickets with a deadline get what is left of it
+                client_kwargs={"timeout": LLM_TIMEOUT},
+                temperature=0.3,
+                format="json"
+            )
+        return self._llm
+
+    @llm.setter
+    def llm(self, llm):
+        self._llm = llm
+    
+    def classify_ticket(self, ticket: ServiceNowTicket,
+                        cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """Classify ticket with multiple fallback strategies"""
         classification_prompt = f"""
         Analyze this ServiceNow ticket and return ONLY the JSON object with these exact fields:
@@ -47,7 +61,7 @@ class TicketClassifier:
         
         try:
             # First attempt with strict JSON format
-            response = self.llm.invoke(classification_prompt)
+            response = invoke_llm(self.llm, classification_prompt, cancel_token)
             print(f"Initial LLM Response: {response}")
             
             # Multiple parsing strategies
@@ -57,6 +71,8 @@ class TicketClassifier:
             print(f"Successful Classification: {classification}")
             return classification
             
+        except TicketCancelled:
+            raise
         except Exception as e:
             print(f"Classification failed: {str(e)}")
             # Fallback to default values if parsing fails
@@ -117,6 +133,10 @@ class TicketClassifier:
     def _get_fallback_classification(self, ticket: ServiceNowTicket) -> Dict[str, Any]:
         """Provide fallback classification when parsing fails"""
         print("Using fallback classification")
+        return self.heuristic_classification(ticket)
+
+    def heuristic_classification(self, ticket: ServiceNowTicket) -> Dict[str, Any]:
+        """Classification from keywords of the ticket, without the LLM"""
         return {
             "middleware_type": "apache" if "apache" in ticket.description.lower() else "tomcat",
             "action": "install" if "install" in ticket.description.lower() else "upgrade",
@@ -1,32 +1,61 @@
 # ticket_executor.py
+import re
 import subprocess
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from ticket_receiver import ServiceNowTicket  # Add this import
 
+# Host names a playbook may target (RFC 1123 labels)
+HOSTNAME_PATTERN = re.compile(r"^(?=.{1,253}$)[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?(\.[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?)*$")
+
 class TicketExecutor:
     def __init__(self):
         self.name = "ticket_executor"
         self.playbook_path = "./playbooks/"
+        self.playbooks = ["apache_install.yml", "tomcat_upgrade.yml"]
     
-    def execute_playbook(self, ticket: ServiceNowTicket, classification: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute appropriate Ansible playbook"""
+    def prepare_execution(self, ticket: ServiceNowTicket, classification: Dict[str, Any]) -> Dict[str, Any]:
+        """Look up the playbook and pre-flight its target host, changing nothing"""
+        playbook_name = classification["playbook_required"]
+        if playbook_name not in self.playbooks:
+            raise ValueError(f"Invalid playbook: {playbook_name}")
+        if not ticket.ci_name or not HOSTNAME_PATTERN.match(ticket.ci_name):
+            raise ValueError(f"Invalid target host: {ticket.ci_name!r}")
+        playbook_path = f"{self.playbook_path}{playbook_name}"
+        return {
+            "playbook": playbook_name,
+            "playbook_path": playbook_path,
+            "target_host": ticket.ci_name,
+            "preflight": self._mock_preflight_checks(playbook_path, ticket)
+        }
+
+    def execute_playbook(self, ticket: ServiceNowTicket, classification: Dict[str, Any],
+                         timeout: Optional[float] = None,
+                         plan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute appropriate Ansible playbook within timeout, reusing a matching plan"""
         try:
-            playbook_name = classification["playbook_required"]
-            if playbook_name not in ["apache_install.yml", "tomcat_upgrade.yml"]:
-                raise ValueError(f"Invalid playbook: {playbook_name}")
-                
-            playbook_path = f"{self.playbook_path}{playbook_name}"
-            execution_result = self._mock_ansible_execution(playbook_path, ticket)
+            if not plan or plan["playbook"] != classification["playbook_required"]:
+                plan = self.prepare_execution(ticket, classification)
+            execution_result = self._mock_ansible_execution(plan["playbook_path"], ticket, timeout)
             
-            print(f"⚙️ Executing playbook {playbook_name} for ticket {ticket.ticket_id}")
+            print(f"⚙️ Executing playbook {plan['playbook']} for ticket {ticket.ticket_id}")
             return execution_result
         except Exception as e:
             print(f"Execution error: {str(e)}")
             raise ValueError(f"Playbook execution failed: {str(e)}")
+
+    def _mock_preflight_checks(self, playbook_path: str, ticket: ServiceNowTicket) -> Dict[str, str]:
+        """Mock pre-flight checks (syntax check and ping of the host)"""
+        return {
+            "playbook_syntax": "ok",
+            "host_reachable": "ok"
+        }
     
-    def _mock_ansible_execution(self, playbook_path: str, ticket: ServiceNowTicket) -> Dict[str, Any]:
+    def _mock_ansible_execution(self, playbook_path: str, ticket: ServiceNowTicket,
+                                timeout: Optional[float] = None) -> Dict[str, Any]:
         """Mock Ansible playbook execution"""
+        if timeout is not None and timeout <= 0:
+            raise subprocess.TimeoutExpired(playbook_path, timeout)
         return {
             "status": "success",
             "playbook": playbook_path,
@@ -35,4 +64,4 @@ class TicketExecutor:
             "tasks_completed": 5,
             "tasks_failed": 0,
             "logs": "Mock execution completed successfully"
-        }
\ No newline at end of file
+        }
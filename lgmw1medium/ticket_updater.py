@@ -1,5 +1,4 @@
 # ticket_updater.py
-import requests
 from typing import Dict, Any
 from ticket_receiver import ServiceNowTicket  # Add this import
 
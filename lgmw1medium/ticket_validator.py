@@ -1,25 +1,39 @@
 # ticket_validator.py
-from typing import Dict, Any
-from langchain_ollama import OllamaLLM  # Updated import
+from typing import Dict, Any, Optional
 from ticket_receiver import ServiceNowTicket
+from cancellation import LLM_TIMEOUT, CancellationToken, invoke_llm
 
 class TicketValidator:
     def __init__(self):
         self.name = "ticket_validator"
-        self.llm = OllamaLLM(
-            model="mistral",
-            timeout=300,  # Set timeout to 300 seconds
-            temperature=0.3
-        )
+        self._llm = None
+
+    @property
+    def llm(self):
+        """Ollama client, built on first use as langchain_ollama is slow to import"""
+        if self._llm is None:
+            from langchain_ollama import OllamaLLM
+            self._llm = OllamaLLM(
+                model="mistral",
+                # Requests of tickets with a deadline get what is left of it
+                client_kwargs={"timeout": LLM_TIMEOUT},
+                temperature=0.3
+            )
+        return self._llm
+
+    @llm.setter
+    def llm(self, llm):
+        self._llm = llm
     
-    def validate_execution(self, ticket: ServiceNowTicket, execution_result: Dict[str, Any]) -> Dict[str, Any]:
+    def validate_execution(self, ticket: ServiceNowTicket, execution_result: Dict[str, Any],
+                           cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """Validate middleware installation/upgrade"""
         
         validation_checks = {
             "service_status": self._check_service_status(ticket.ci_name),
             "port_connectivity": self._check_port_connectivity(ticket.ci_name),
             "configuration_valid": self._validate_configuration(ticket.ci_name),
-            "logs_analysis": self._analyze_logs(execution_result["logs"])
+            "logs_analysis": self._analyze_logs(execution_result["logs"], cancel_token)
         }
         
         overall_status = "success" if all(validation_checks.values()) else "failed"
@@ -47,7 +61,7 @@ class TicketValidator:
         """Mock configuration validation"""
         return True
     
-    def _analyze_logs(self, logs: str) -> bool:
+    def _analyze_logs(self, logs: str, cancel_token: Optional[CancellationToken] = None) -> bool:
         """Use LLM to analyze execution logs"""
         analysis_prompt = f"""
         Analyze these execution logs and determine if the installation/upgrade was successful:
@@ -57,7 +71,7 @@ class TicketValidator:
         Return only 'true' if successful, 'false' if failed.
         """
         
-        response = self.llm.invoke(analysis_prompt)  # Updated method call
+        response = invoke_llm(self.llm, analysis_prompt, cancel_token)
         return response.strip().lower() == "true"
     
     def _generate_recommendations(self, checks: Dict[str, bool]) -> str:
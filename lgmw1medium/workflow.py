@@ -1,20 +1,45 @@
 # workflow.py (updated with database fixes)
-from langgraph.graph import StateGraph, END
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 from agent_state import AgentState
 from ticket_receiver import TicketReceiver, ServiceNowTicket
 from ticket_classifier import TicketClassifier
 from ticket_executor import TicketExecutor
 from ticket_validator import TicketValidator
 from ticket_updater import TicketUpdater
-from database import IncidentDB
+from database import IncidentDB, IncidentUnitOfWork
+from events import EventRelay, TicketEventBus
+from host_locks import HostLocks
+from cancellation import CancellationRegistry, DeadlineExceeded, TicketCancelled, TicketHandedOff
 from logger import WorkflowLogger
+from concurrent.futures import Future, ThreadPoolExecutor
 import json
 from datetime import datetime
 import sqlite3
+import threading
+import time
+
+# Node a ticket resumes at, by the status its last completed node wrote
+RESUME_NODES = {
+    "received": "classify",
+    "classified": "execute",
+    "executed": "validate",
+    "validated": "update",
+}
+
+# Seconds a ticket may take from the start of processing, by priority; LLM
+# calls, playbook runs and host lock waits are bounded by what is left
+PRIORITY_DEADLINES = {
+    "critical": 300,
+    "high": 600,
+    "medium": 900,
+    "low": 1800,
+}
+DEFAULT_DEADLINE = PRIORITY_DEADLINES["medium"]
 
 class MiddlewareInstallationWorkflow:
-    def __init__(self, db: Optional[IncidentDB] = None, logger: Optional[WorkflowLogger] = None):
+    def __init__(self, db: Optional[IncidentDB] = None, logger: Optional[WorkflowLogger] = None,
+                 events: Optional[Union[TicketEventBus, EventRelay]] = None, host_locks: Optional[HostLocks] = None,
+                 cancellations: Optional[CancellationRegistry] = None, speculation_workers: int = 4):
         self.ticket_receiver = TicketReceiver()
         self.ticket_classifier = TicketClassifier()
         self.ticket_executor = TicketExecutor()
@@ -23,20 +48,54 @@ class MiddlewareInstallationWorkflow:
         
         # Initialize database and logger with defaults if not provided
         self.db = db if db else IncidentDB()
-        self.logger = logger if logger else WorkflowLogger()
+        self._logger = logger
+        # Status transitions are pushed to live subscribers once written
+        self.events = events
+        # Serializes playbook runs per target host so tickets can run in parallel
+        self.host_locks = host_locks if host_locks else HostLocks()
+        # Tokens checked between steps so cancelled tickets stop early
+        self.cancellations = cancellations if cancellations else CancellationRegistry()
+        # Execution is prepared on these threads while the LLM classifies
+        self._speculation = ThreadPoolExecutor(
+            max_workers=speculation_workers,
+            thread_name_prefix="speculation"
+        )
+        self._speculation_lock = threading.Lock()
+        self.speculation = {"hits": 0, "misses": 0, "late": 0, "failed": 0, "saved_seconds": 0.0}
+        # Pending database writes of the tickets currently being processed
+        self._units_of_work: Dict[str, IncidentUnitOfWork] = {}
         
-        # Create the workflow graph
-        self.workflow = StateGraph(AgentState)
-        self._build_workflow()
+        # The workflow graph is built and compiled once, on first use
+        self.workflow = None
+        self._app = None
+        self._graph_lock = threading.Lock()
+
+    @property
+    def logger(self) -> WorkflowLogger:
+        # Created on first use; it sets up log files and handlers
+        if self._logger is None:
+            self._logger = WorkflowLogger()
+        return self._logger
+
+    def _compiled_app(self):
+        if self._app is None:
+            with self._graph_lock:
+                if self._app is None:
+                    self._build_workflow()
+                    self._app = self.workflow.compile()
+        return self._app
     
     def _build_workflow(self):
         """Build the multi-agent workflow graph"""
+        # langgraph is slow to import, so it is only loaded once a ticket runs
+        from langgraph.graph import StateGraph, END
+        self.workflow = StateGraph(AgentState)
         # Add nodes
-        self.workflow.add_node("receive", self._receive_node)
-        self.workflow.add_node("classify", self._classify_node)
-        self.workflow.add_node("execute", self._execute_node)
-        self.workflow.add_node("validate", self._validate_node)
-        self.workflow.add_node("update", self._update_node)
+        self.workflow.add_node("receive", self._cancellable("receive", self._receive_node))
+        self.workflow.add_node("classify", self._cancellable("classify", self._classify_node))
+        self.workflow.add_node("execute", self._cancellable("execute", self._execute_node))
+        self.workflow.add_node("validate", self._cancellable("validate", self._validate_node))
+        self.workflow.add_node("update", self._cancellable("update", self._update_node))
         
         # Add edges
         self.workflow.add_edge("receive", "classify")
@@ -45,8 +104,40 @@ class MiddlewareInstallationWorkflow:
         self.workflow.add_edge("validate", "update")
         self.workflow.add_edge("update", END)
         
-        # Set entry point
-        self.workflow.set_entry_point("receive")
+        # Set entry point; resumed tickets skip the nodes they completed
+        self.workflow.set_conditional_entry_point(
+            self._entry_node,
+            ["receive", "classify", "execute", "validate", "update"]
+        )
+
+    def _cancellable(self, name: str, node):
+        """Wrap a node so it does not start for a cancelled or overdue ticket"""
+        def run(state: AgentState) -> AgentState:
+            token = self._cancel_token(state)
+            try:
+                token.raise_if_cancelled()
+                return node(state)
+            except DeadlineExceeded as e:
+                e.node = e.node or name
+                raise
+            except Exception as e:
+                # A step that failed for lack of time, e.g. a playbook timeout
+                if not token.expired or isinstance(e, TicketCancelled):
+                    raise
+                exceeded = DeadlineExceeded(token.ticket_id, token.deadline)
+                exceeded.node = name
+                raise exceeded from e
+        return run
+
+    def _cancel_token(self, state: AgentState):
+        return self.cancellations.token(state["ticket"].ticket_id)
+
+    def _remaining(self, state: AgentState) -> float:
+        """Seconds left of the ticket's deadline"""
+        return max(0.0, state["deadline"] - time.time())
+
+    def _entry_node(self, state: AgentState) -> str:
+        return state.get("resume_from") or "receive"
     
     def _receive_node(self, state: AgentState) -> AgentState:
         """Ticket receiver node with logging"""
@@ -56,17 +147,15 @@ class MiddlewareInstallationWorkflow:
             
             # Log to database
             ticket_id = state["ticket"].ticket_id
-            self._safe_db_operation(
-                self.db.create_incident,
-                state["ticket"].dict()
-            )
-            self._safe_db_operation(
-                self.db.log_audit,
-                ticket_id,
+            uow = self._unit_of_work(ticket_id)
+            uow.create_incident(state["ticket"].dict())
+            uow.log_audit(
                 "ticket_received",
                 "ticket_receiver",
                 "Ticket received and validated"
             )
+            self._safe_db_operation(uow.end_node)
+            self._publish(ticket_id, "received", state)
             self.logger.log_incident(
                 ticket_id,
                 "received",
@@ -82,30 +171,35 @@ class MiddlewareInstallationWorkflow:
         """Ticket classifier node with logging"""
         try:
             state["current_agent"] = "ticket_classifier"
-            classification = self.ticket_classifier.classify_ticket(state["ticket"])
+            guess = self.ticket_classifier.heuristic_classification(state["ticket"])
+            preparation = self._speculation.submit(self._prepare, state["ticket"], guess)
+            try:
+                classification = self.ticket_classifier.classify_ticket(
+                    state["ticket"], self._cancel_token(state)
+                )
+            except BaseException:
+                preparation.cancel()
+                raise
             state["classification"] = classification
+            state["execution_plan"] = self._commit_speculation(preparation, guess, classification)
             
             # Update database
-            ticket_id = state["ticket"].ticket_id
-            self._safe_db_operation(
-                self.db.update_incident,
-                ticket_id,
-                {
-                    "classification": json.dumps(classification),
-                    "status": "classified"
-                }
-            )
-            self._safe_db_operation(
-                self.db.log_audit,
-                ticket_id,
+            uow = self._unit_of_work(state["ticket"].ticket_id)
+            uow.update_incident({
+                "classification": json.dumps(classification),
+                "status": "classified"
+            })
+            uow.log_audit(
                 "ticket_classified",
                 "ticket_classifier",
                 json.dumps(classification)
             )
+            self._safe_db_operation(uow.end_node)
             
             state["messages"].append(
                 f"Ticket classified: {classification['middleware_type']} {classification['action']}"
             )
+            self._publish(state["ticket"].ticket_id, "classified", state)
             return state
         except Exception as e:
             self._handle_error(state, "classify", str(e))
@@ -115,25 +209,24 @@ class MiddlewareInstallationWorkflow:
         """Ticket executor node with logging"""
         try:
             state["current_agent"] = "ticket_executor"
-            execution_result = self.ticket_executor.execute_playbook(
-                state["ticket"], 
-                state["classification"]
-            )
+            # Only one playbook may change a host at a time
+            with self.host_locks.hold(state["ticket"].ci_name, self._cancel_token(state),
+                                      state["ticket"].ticket_id):
+                execution_result = self.ticket_executor.execute_playbook(
+                    state["ticket"], 
+                    state["classification"],
+                    timeout=self._remaining(state),
+                    plan=state.get("execution_plan")
+                )
             state["execution_result"] = execution_result
             
             # Update database
-            ticket_id = state["ticket"].ticket_id
-            self._safe_db_operation(
-                self.db.update_incident,
-                ticket_id,
-                {
-                    "execution_result": json.dumps(execution_result),
-                    "status": "executed"
-                }
-            )
-            self._safe_db_operation(
-                self.db.log_audit,
-                ticket_id,
+            uow = self._unit_of_work(state["ticket"].ticket_id)
+            uow.update_incident({
+                "execution_result": json.dumps(execution_result),
+                "status": "executed"
+            })
+            uow.log_audit(
                 "playbook_executed",
                 "ticket_executor",
                 json.dumps({
@@ -141,8 +234,10 @@ class MiddlewareInstallationWorkflow:
                     "status": execution_result.get("status")
                 })
             )
+            self._safe_db_operation(uow.end_node)
             
             state["messages"].append(f"Playbook executed: {execution_result['status']}")
+            self._publish(state["ticket"].ticket_id, "executed", state)
             return state
         except Exception as e:
             self._handle_error(state, "execute", str(e))
@@ -154,23 +249,18 @@ class MiddlewareInstallationWorkflow:
             state["current_agent"] = "ticket_validator"
             validation_report = self.ticket_validator.validate_execution(
                 state["ticket"], 
-                state["execution_result"]
+                state["execution_result"],
+                self._cancel_token(state)
             )
             state["validation_report"] = validation_report
             
             # Update database
-            ticket_id = state["ticket"].ticket_id
-            self._safe_db_operation(
-                self.db.update_incident,
-                ticket_id,
-                {
-                    "validation_report": json.dumps(validation_report),
-                    "status": "validated"
-                }
-            )
-            self._safe_db_operation(
-                self.db.log_audit,
-                ticket_id,
+            uow = self._unit_of_work(state["ticket"].ticket_id)
+            uow.update_incident({
+                "validation_report": json.dumps(validation_report),
+                "status": "validated"
+            })
+            uow.log_audit(
                 "execution_validated",
                 "ticket_validator",
                 json.dumps({
@@ -178,10 +268,12 @@ class MiddlewareInstallationWorkflow:
                     "checks": validation_report["checks"]
                 })
             )
+            self._safe_db_operation(uow.end_node)
             
             state["messages"].append(
                 f"Validation completed: {validation_report['overall_status']}"
             )
+            self._publish(state["ticket"].ticket_id, "validated", state)
             return state
         except Exception as e:
             self._handle_error(state, "validate", str(e))
@@ -198,19 +290,13 @@ class MiddlewareInstallationWorkflow:
             state["update_response"] = update_response
             
             # Final update
-            ticket_id = state["ticket"].ticket_id
             final_status = state["validation_report"]["overall_status"]
-            self._safe_db_operation(
-                self.db.update_incident,
-                ticket_id,
-                {
-                    "status": final_status,
-                    "messages": json.dumps(state["messages"])
-                }
-            )
-            self._safe_db_operation(
-                self.db.log_audit,
-                ticket_id,
+            uow = self._unit_of_work(state["ticket"].ticket_id)
+            uow.update_incident({
+                "status": final_status,
+                "messages": json.dumps(state["messages"])
+            })
+            uow.log_audit(
                 "ticket_updated",
                 "ticket_updater",
                 json.dumps({
@@ -218,13 +304,66 @@ class MiddlewareInstallationWorkflow:
                     "update_response": update_response
                 })
             )
+            self._safe_db_operation(uow.end_node)
             
             state["messages"].append("ServiceNow ticket updated")
+            self._publish(state["ticket"].ticket_id, final_status, state)
             return state
         except Exception as e:
             self._handle_error(state, "update", str(e))
             raise
     
+    def _prepare(self, ticket: ServiceNowTicket, classification: Dict[str, Any]):
+        """Prepare execution on a speculation thread; returns (plan, seconds taken)"""
+        started = time.monotonic()
+        plan = self.ticket_executor.prepare_execution(ticket, classification)
+        return plan, time.monotonic() - started
+
+    def _commit_speculation(self, preparation: Future, guess: Dict[str, Any],
+                            classification: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep the plan prepared from the heuristic guess if the LLM chose the same playbook"""
+        if classification.get("playbook_required") != guess["playbook_required"]:
+            preparation.cancel()
+            self._count_speculation("misses")
+            return {}
+        if preparation.cancel():
+            self._count_speculation("late")
+            return {}
+        started = time.monotonic()
+        try:
+            plan, seconds = preparation.result()
+        except Exception:
+            # The execute node prepares again and reports the error
+            self._count_speculation("failed")
+            return {}
+        self._count_speculation("hits", max(0.0, seconds - (time.monotonic() - started)))
+        return plan
+
+    def _count_speculation(self, outcome: str, saved_seconds: float = 0.0):
+        with self._speculation_lock:
+            self.speculation[outcome] += 1
+            self.speculation["saved_seconds"] += saved_seconds
+
+    def speculation_stats(self) -> Dict[str, Any]:
+        """Outcomes of preparing execution while the LLM classifies"""
+        with self._speculation_lock:
+            stats = dict(self.speculation)
+        decided = stats["hits"] + stats["misses"] + stats["late"] + stats["failed"]
+        stats["hit_rate"] = stats["hits"] / decided if decided else 0.0
+        return stats
+
+    def _unit_of_work(self, ticket_id: str) -> IncidentUnitOfWork:
+        """Get the write buffer of a ticket being processed"""
+        if ticket_id not in self._units_of_work:
+            self._units_of_work[ticket_id] = self.db.unit_of_work(ticket_id)
+        return self._units_of_work[ticket_id]
+
+    def _publish(self, ticket_id: str, status: str, state: AgentState):
+        """Push a node's status transition to live subscribers"""
+        if self.events:
+            self.events.publish(ticket_id, status, state["current_agent"],
+                                state["messages"][-1] if state["messages"] else None)
+
     def _safe_db_operation(self, operation, *args, **kwargs):
         """Wrapper for database operations with error handling"""
         try:
@@ -240,19 +379,26 @@ class MiddlewareInstallationWorkflow:
     def _handle_error(self, state: AgentState, agent: str, error: str):
         """Centralized error handling with logging"""
         ticket_id = state["ticket"].ticket_id if "ticket" in state else "unknown"
+        if self.cancellations.is_stopped(ticket_id):
+            return  # Stopping a cancelled or overdue ticket is not an error
         
         error_msg = f"{agent} failed: {error}"
         state.setdefault("errors", []).append(error_msg)
         
-        # Log error to database
+        # Log error to database, flushing anything the failed node buffered
         try:
-            self._safe_db_operation(
-                self.db.log_audit,
-                ticket_id,
-                f"{agent}_error",
-                agent,
-                error_msg
-            )
+            uow = self._units_of_work.get(ticket_id)
+            if uow:
+                uow.log_audit(f"{agent}_error", agent, error_msg)
+                self._safe_db_operation(uow.flush)
+            else:
+                self._safe_db_operation(
+                    self.db.log_audit,
+                    ticket_id,
+                    f"{agent}_error",
+                    agent,
+                    error_msg
+                )
         except:
             pass  # Prevent recursive errors
             
@@ -262,7 +408,7 @@ class MiddlewareInstallationWorkflow:
             {"ticket_id": ticket_id, "agent": agent}
         )
     
-    def process_ticket(self, ticket_data: Dict[str, Any]) -> AgentState:
+    def process_ticket(self, ticket_data: Dict[str, Any], resume: bool = False) -> AgentState:
         """Process a ticket through the entire workflow with logging"""
         try:
             if not ticket_data:
@@ -278,17 +424,31 @@ class MiddlewareInstallationWorkflow:
             initial_state = AgentState(
                 ticket=self.ticket_receiver.receive_ticket(ticket_data),
                 classification={},
+                execution_plan={},
                 execution_result={},
                 validation_report={},
                 update_response={},
                 messages=[],
                 current_agent="",
-                errors=[]
+                errors=[],
+                resume_from="",
+                deadline=time.time() + PRIORITY_DEADLINES.get(
+                    str(ticket_data.get("priority") or "").lower(), DEFAULT_DEADLINE
+                )
             )
+            self.cancellations.token(initial_state["ticket"].ticket_id).deadline = initial_state["deadline"]
+            if resume:
+                self._restore_state(initial_state)
             
             # Compile and run workflow
-            app = self.workflow.compile()
-            result = app.invoke(initial_state)
+            ticket_id = initial_state["ticket"].ticket_id
+            uow = self._unit_of_work(ticket_id)
+            try:
+                result = self._compiled_app().invoke(initial_state)
+                # Relaxed commit mode writes everything here
+                self._safe_db_operation(uow.flush)
+            finally:
+                self._units_of_work.pop(ticket_id, None)
             
             # Log completion
             self.logger.log(
@@ -302,6 +462,15 @@ class MiddlewareInstallationWorkflow:
             )
             
             return result
+        except DeadlineExceeded as e:
+            self._log_deadline_exceeded(initial_state, e)
+            raise
+        except TicketHandedOff as e:
+            self.logger.log("INFO", str(e))
+            raise
+        except TicketCancelled as e:
+            self._log_stopped(e.ticket_id)
+            raise
         except Exception as e:
             self._handle_error(
                 initial_state if 'initial_state' in locals() else {},
@@ -309,31 +478,72 @@ class MiddlewareInstallationWorkflow:
                 str(e)
             )
             raise
+        finally:
+            if ticket_data:
+                self.cancellations.release(ticket_data.get("ticket_id"))
+
+    def _log_deadline_exceeded(self, state: AgentState, error: DeadlineExceeded):
+        """Record where a ticket was when it ran out of time"""
+        node = error.node or "workflow"
+        self.cancellations.deadline_exceeded(node)
+        details = {
+            "node": node,
+            "deadline": datetime.fromtimestamp(error.deadline).isoformat(),
+            "priority": state["ticket"].priority
+        }
+        self._safe_db_operation(
+            self.db.log_audit, error.ticket_id, "deadline_exceeded", "workflow", json.dumps(details)
+        )
+        self.logger.log("WARNING", str(error), details)
+
+    def _log_stopped(self, ticket_id: str):
+        """Record how long a cancelled ticket took to stop"""
+        latency = self.cancellations.stopped_after(self.cancellations.token(ticket_id))
+        self._safe_db_operation(
+            self.db.log_audit,
+            ticket_id,
+            "ticket_stopped",
+            "workflow",
+            json.dumps({"seconds_after_cancel": round(latency, 3)})
+        )
+        self.logger.log(
+            "INFO",
+            f"Ticket {ticket_id} stopped after cancellation",
+            {"seconds_after_cancel": latency}
+        )
     
+    def _restore_state(self, state: AgentState):
+        """Load the stored node results of a ticket being resumed"""
+        ticket_id = state["ticket"].ticket_id
+        incident = self._safe_db_operation(
+            self.db.get_incident, ticket_id, include_payloads=True
+        )
+        if not incident or incident["status"] not in RESUME_NODES:
+            return
+        if incident["resumable"]:
+            self._safe_db_operation(self.db.update_incident, ticket_id, {"resumable": 0})
+        for field in ("classification", "execution_result", "validation_report"):
+            state[field] = incident[field] or {}
+        state["resume_from"] = RESUME_NODES[incident["status"]]
+        state["messages"].append(f"Resumed at {state['resume_from']} after restart")
+        self._safe_db_operation(
+            self.db.log_audit,
+            ticket_id,
+            "ticket_resumed",
+            "workflow",
+            json.dumps({"status": incident["status"], "resume_from": state["resume_from"]})
+        )
+
     def get_incident_history(self, ticket_id: str) -> Dict[str, Any]:
         """Get complete incident history from database"""
         try:
-            # Get incident details
-            incident = self._safe_db_operation(
-                self.db.get_incident,
+            history = self._safe_db_operation(
+                self.db.get_incident_history,
                 ticket_id
             )
-            if not incident:
+            if not history:
                 return {"error": "Incident not found"}
-            
-            # Get audit logs
-            with self.db.conn:
-                cursor = self.db.conn.cursor()
-                cursor.execute(
-                    "SELECT * FROM audit_log WHERE ticket_id = ? ORDER BY timestamp DESC",
-                    (ticket_id,)
-                )
-                logs = [dict(row) for row in cursor.fetchall()]
-            
-            return {
-                "incident": incident,
-                "audit_logs": logs
-            }
+            return history
         except Exception as e:
             self.logger.log(
                 "ERROR",